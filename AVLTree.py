@@ -1,8 +1,12 @@
 """A python AVL balanced binary search tree implementation."""
+from time import perf_counter
 from typing import Iterable
 
 from Tree import TreeNode
 from Tree import Tree
+from Tree import merge
+
+_MIN_RUN = 32  # sort merges ascending runs instead of building a tree when they average at least this many values
 
 class AVLTreeNode(TreeNode):
     """A node for use in binary search trees.
@@ -12,6 +16,7 @@ class AVLTreeNode(TreeNode):
     val : Any
         The data this node holds.
     """
+    _fields = TreeNode._fields + ('balance',)
 
     def __init__(self, val, parent=None):
         super().__init__(val, parent)
@@ -29,34 +34,58 @@ class AVLTreeNode(TreeNode):
 # move internal recursive functions that don't depend on external data outside as functions
 class AVLTree(Tree):
     """ A binary search tree """
-    def __init__(self, values=()):
+    _node_type = AVLTreeNode  # class of the nodes this tree creates (subclasses may extend the node)
+
+    def __init__(self, values=(), multiset=False, lazy_delete=False, tombstone_ratio=0.5):
         """ Constructor for this bst
             Can take optional values (list, tuple, or set (all items must be same type)) to build initial tree
             ALLOWS DUPLICATES (simple implementation that always stores duplicates to the right)
+            With multiset=True duplicates are instead counted on the node already holding that value
+            With lazy_delete=True deletes leave tombstones instead of relinking and rebalancing, and the tree is
+            compacted once tombstones exceed tombstone_ratio of its entries (0 < tombstone_ratio <= 1, 1 leaves it
+            to compact())
         """
+        if not 0 < tombstone_ratio <= 1:
+            raise ValueError("tombstone_ratio must be in (0, 1]")
+        self.multiset = multiset
+        self.lazy_delete = lazy_delete
+        self.tombstone_ratio = tombstone_ratio
         super().__init__(values)
 
     def insert(self, new_val):
         """ Wrapper for insertNode that initiates the insertion by calling insertNode on root"""
+        self._snapshot = None
+        if self._hooks:
+            start = perf_counter()
+        self._size += 1
+        if self.multiset:
+            new_node = self._find(self.root, new_val)
+            if new_node is not None:
+                if not new_node.count:  # revive a tombstone
+                    self._tombstones -= 1
+                new_node.count += 1
+                if self._hooks:
+                    self._emit('insert', new_val, (new_node,), perf_counter() - start)
+                return
         if self.root is None:
-            self.root = AVLTreeNode(new_val)
+            new_node = self.root = self._new_node(new_val)
         else:
-            self._insert(self.root, new_val)
+            new_node = self._insert(self.root, new_val)
+        if self._hooks:
+            self._emit('insert', new_val, (new_node,), perf_counter() - start)
 
     def _insert(self, current, new_val):
-        """ Inserts a node storing the new_value into the BST"""
+        """ Inserts a node storing the new_value into the BST, returning the new node"""
         if new_val < current.value:
             if current.left:
-                self._insert(current.left, new_val)
-            else:
-                current.left = AVLTreeNode(new_val, parent=current)
-                self._update_critical_balance(current.left)
+                return self._insert(current.left, new_val)
+            new_node = current.left = self._new_node(new_val, parent=current)
         else:
             if current.right:
-                self._insert(current.right, new_val)
-            else:
-                current.right = AVLTreeNode(new_val, parent=current)
-                self._update_critical_balance(current.right)
+                return self._insert(current.right, new_val)
+            new_node = current.right = self._new_node(new_val, parent=current)
+        self._update_critical_balance(new_node)
+        return new_node
 
     def _update_critical_balance(self, current):
         """ Travels up the tree recursively checking and updating the balance. when reaches critical unbalanced point, rebalances tree and stops"""
@@ -73,9 +102,21 @@ class AVLTree(Tree):
 
     def delete(self, del_val):
         """Calls find to access the node to be deleted, passing it to _delete to do the actual removal"""
-        del_node = self._find(self.root, del_val)
-        print(del_node)
-        self._delete(del_node)
+        self._snapshot = None
+        if self._hooks:
+            start = perf_counter()
+        if self.lazy_delete:
+            del_node = self._mark_deleted(del_val)
+        else:
+            del_node = self._find(self.root, del_val)
+            if del_node:
+                self._size -= 1
+                if del_node.count > 1:  # multiset node, just drop one copy
+                    del_node.count -= 1
+                else:
+                    self._delete(del_node)
+        if self._hooks and del_node:
+            self._emit('delete', del_val, (del_node,), perf_counter() - start)
 
     def _delete(self, del_node):
         """ Removes the passed del_node from the tree, relinking around the removed node"""
@@ -90,6 +131,8 @@ class AVLTree(Tree):
         else: # we have 2 children so replace del_node with predecessor (since dupes stored to left)
             pre_node = self._find_max(del_node.left)
             del_node.value = pre_node.value
+            if self.multiset:
+                del_node.count = pre_node.count
             self._delete(pre_node)
 
     def _find_max(self, current):
@@ -105,24 +148,38 @@ class AVLTree(Tree):
             if self.root:
                 self.root.parent = None
         else: #any non-root node has a parent
-            if replacee_node is replacee_node.parent.left:
+            left = replacee_node is replacee_node.parent.left
+            if left:
                 replacee_node.parent.left = replacer_node
             else:
                 replacee_node.parent.right = replacer_node
             if replacer_node is not None:
                 replacer_node.parent = replacee_node.parent
-            self._update_path(replacee_node.parent) # update the balances back up the path to the root, rebalancing as you go
+            self._update_path(replacee_node.parent, left) # update the balances back up the path to the root, rebalancing as you go
 
-    def _update_path(self, current):
-        if current is None:
-            return
-        current.balance = self._height(current.left) - self._height(current.right)
-        if abs(current.balance) > 1:
-            self.rebalance(current)
-        self._update_path(current.parent)
+    def _update_path(self, current, left):
+        """ Travels up from current, whose left (or right) subtree just got one level shorter, adjusting balances and
+            rebalancing as it goes. Stops once a subtree's height is unchanged, so this is O(log n). """
+        while current is not None:
+            current.balance += -1 if left else 1
+            if abs(current.balance) > 1:
+                sibling = current.right if current.balance < 0 else current.left
+                shorter = sibling.balance != 0  # a single rotation around a balanced sibling keeps the height
+                self.rebalance(current)
+                current = current.parent  # root of the rotated subtree
+                if not shorter:
+                    return
+            elif current.balance != 0:  # was balanced, so the height is unchanged
+                return
+            if current.parent is not None:
+                left = current is current.parent.left
+            current = current.parent
 
     def rebalance(self, current):
         """ Rebalance a node that is unbalanced via a series of rotations"""
+        if self._hooks:
+            start = perf_counter()
+            value = current.value
         if current.balance < -1: # current node right heavy
             if current.right.balance > 0: # right child left heavy
                 self.rotate_right(current.right)
@@ -135,9 +192,13 @@ class AVLTree(Tree):
                 self.rotate_right(current)
             else:
                 self.rotate_right(current)
+        if self._hooks:
+            self._emit('rebalance', value, (current, current.parent), perf_counter() - start)
 
     def rotate_left(self, og_root):
         """ Rotate the subtree with root og_root to the left so that right subtree of og_root replaces og_root"""
+        if self._hooks:
+            start = perf_counter()
         new_root = og_root.right
         og_root.right = new_root.left
         if new_root.left:
@@ -154,15 +215,19 @@ class AVLTree(Tree):
         og_root.parent = new_root
         og_root.balance = og_root.balance + 1 - min(new_root.balance, 0)
         new_root.balance = new_root.balance + 1 + max(og_root.balance, 0)
+        if self._hooks:
+            self._emit('rotate', og_root.value, (og_root, new_root), perf_counter() - start)
 
     def rotate_right(self, og_root):
         """Rotate the subtree with root og_root to the right so that left subtree of og_root replaces og_root"""
+        if self._hooks:
+            start = perf_counter()
         new_root = og_root.left
         og_root.left = new_root.right
         if new_root.right:
             new_root.right.parent = og_root
         new_root.parent = og_root.parent
-        if og_root.value == self.root.value: # og_root is tree root
+        if og_root is self.root: # og_root is tree root
             self.root = new_root
         else:
             if og_root is og_root.parent.right:
@@ -173,6 +238,11 @@ class AVLTree(Tree):
         og_root.parent = new_root
         og_root.balance = og_root.balance - 1 - max(new_root.balance, 0)
         new_root.balance = new_root.balance - 1 + min(0, og_root.balance)
+        if self._hooks:
+            self._emit('rotate', og_root.value, (og_root, new_root), perf_counter() - start)
+
+    def _init_built_node(self, node, left_height, right_height, depth):
+        node.balance = left_height - right_height
 
     def _balance(self, current):
         """Returns the balance factor of a node (the diff between heights of left and right subtrees"""
@@ -180,19 +250,46 @@ class AVLTree(Tree):
             return 0
         return (self._height(current.left)-self._height(current.right))
 
-    def _print_level(self, node, level, height):
-        if level < height:
-            if node is None:
-                print('\t' * level + "None")
-            else:
-                level_str = "{}({})".format(node.value, node.balance)
-                print('\t' * level + level_str)
-                self._print_level(node._left, level+1, height)
-                self._print_level(node._right, level+1, height)
+    def _node_label(self, node):
+        return "{}({})".format(node.value, node.balance)
 
 def sort(value_list):
-    tree = AVLTree(value_list)
-    return tree.to_list('in_order')
+    """ Returns the values of value_list in ascending order. Input that is already sorted is returned as is in O(n),
+        and input made of k long ascending runs (at least _MIN_RUN values each on average) is merged run by run in
+        O(n log k); anything else is sorted through an AVLTree.
+    """
+    values = list(value_list)
+    starts = _run_starts(values, max(1, len(values) // _MIN_RUN))
+    if starts is None:
+        return AVLTree(values).to_list('in_order')
+    if len(starts) == 1:
+        return values
+    ends = starts[1:] + [len(values)]
+    return list(merge(*(values[start:end] for start, end in zip(starts, ends))))
+
+def _run_starts(values, max_runs):
+    """ Returns the index where each ascending run of values starts, or None once there are more than max_runs """
+    starts = [0]
+    for i in range(1, len(values)):
+        if values[i] < values[i - 1]:
+            if len(starts) == max_runs:
+                return None
+            starts.append(i)
+    return starts
+
+def nsmallest(n, values):
+    """ Returns the n smallest of values in ascending order. values is streamed through a BoundedTree, so at most n
+        of them are held at once """
+    from BoundedTree import BoundedTree
+    return BoundedTree(n, values, keep='smallest').to_list('in_order')
+
+def nlargest(n, values):
+    """ Returns the n largest of values in descending order. values is streamed through a BoundedTree, so at most n
+        of them are held at once """
+    from BoundedTree import BoundedTree
+    largest = BoundedTree(n, values, keep='largest').to_list('in_order')
+    largest.reverse()
+    return largest
 
 def main():
     s = input("Enter a list of numbers to build your own tree (Enter to use default list): ")
@@ -0,0 +1,159 @@
+"""Balanced binary search trees augmented with a subtree aggregate, for O(log n) range sums, minimums and maximums."""
+import operator
+from collections import namedtuple
+
+from AVLTree import AVLTree
+from RBTree import RBTree
+
+Monoid = namedtuple('Monoid', ['combine', 'identity'])
+Monoid.__doc__ = """ An associative combine(a, b) with an identity element (combine(identity, a) == a) """
+
+SUM = Monoid(operator.add, 0)
+MIN = Monoid(min, float('inf'))
+MAX = Monoid(max, float('-inf'))
+
+
+class AggregateMixin:
+    """ Keeps node.agg = combine over the measures of every value in the node's subtree, in order
+
+        A node starts out with the measure of its own value (a one node subtree). The aggregate is refreshed bottom
+        up along the insertion path once any rotations are done, for both nodes of every rotation, and along the
+        path back to the root after a delete. The tree classes below hook the rotations and delete paths of AVLTree
+        and RBTree respectively; IntervalTree is AggregateAVLTree keeping the greatest interval end.
+    """
+    _node_extras = ('agg',)
+    _eq_settings = ('monoid', '_key', '_measure')
+
+    def __init__(self, values=(), monoid=SUM, key=None, measure=None):
+        """ Constructor for this aggregate tree
+            monoid     the Monoid to aggregate with (SUM, MIN, MAX or your own)
+            measure    maps a stored value to the quantity aggregated (default: the value itself)
+            key        maps a stored value to the key aggregate() ranges are expressed in (default: the value
+                       itself). It must order values the same way they compare, eg. key=lambda kv: kv[0] for
+                       (timestamp, size) pairs.
+        """
+        self.monoid = monoid
+        self._key = key if key is not None else _identity
+        self._measure = measure if measure is not None else _identity
+        super().__init__(values)
+
+    def aggregate(self, lo=None, hi=None):
+        """ Returns the combined measure of every value whose key is in [lo, hi] (either bound may be None for no
+            bound), in O(log n): only the two paths bounding the range are walked, whole subtrees in between are
+            taken from their cached aggregate
+        """
+        combine = self.monoid.combine
+        key = self._key
+        node = self.root
+        while node is not None:  # find the highest node inside the range, where the two bounding paths split
+            k = key(node.value)
+            if lo is not None and k < lo:
+                node = node.right
+            elif hi is not None and hi < k:
+                node = node.left
+            else:
+                break
+        if node is None:
+            return self.monoid.identity
+        left = self._from(node.left, lo)
+        right = self._upto(node.right, hi)
+        return combine(combine(left, self._measure(node.value)), right)
+
+    def _from(self, node, lo):
+        """ Aggregate of the values in the subtree rooted at node with key >= lo """
+        if lo is None:
+            return self._agg(node)
+        combine = self.monoid.combine
+        acc = self.monoid.identity
+        while node is not None:
+            if self._key(node.value) >= lo:  # node and its right subtree are in, keep looking left
+                acc = combine(combine(self._measure(node.value), self._agg(node.right)), acc)
+                node = node.left
+            else:
+                node = node.right
+        return acc
+
+    def _upto(self, node, hi):
+        """ Aggregate of the values in the subtree rooted at node with key <= hi """
+        if hi is None:
+            return self._agg(node)
+        combine = self.monoid.combine
+        acc = self.monoid.identity
+        while node is not None:
+            if self._key(node.value) <= hi:  # node and its left subtree are in, keep looking right
+                acc = combine(acc, combine(self._agg(node.left), self._measure(node.value)))
+                node = node.right
+            else:
+                node = node.left
+        return acc
+
+    def _agg(self, node):
+        return self.monoid.identity if node is None else node.agg
+
+    def _new_node(self, value, parent=None, **kwargs):
+        node = super()._new_node(value, parent, **kwargs)
+        node.agg = self._measure(value)
+        return node
+
+    def _refresh(self, node):
+        """ Recomputes node.agg from its children's aggregates and its own value """
+        combine = self.monoid.combine
+        node.agg = combine(combine(self._agg(node.left), self._measure(node.value)), self._agg(node.right))
+
+    def _refresh_up(self, node):
+        while node is not None:
+            self._refresh(node)
+            node = node.parent
+
+    def _insert(self, current, new_val):
+        top = current.parent is None  # only the outermost call fixes the path, once all rotations are done
+        new_node = super()._insert(current, new_val)
+        if top:
+            self._refresh_up(new_node)
+        return new_node
+
+    def _init_built_node(self, node, left_height, right_height, depth):
+        super()._init_built_node(node, left_height, right_height, depth)
+        self._refresh(node)
+
+
+class AggregateAVLTree(AggregateMixin, AVLTree):
+    """ An AVL tree with O(log n) range aggregates, see AggregateMixin """
+
+    def _update_path(self, current, left):
+        super()._update_path(current, left)
+        self._refresh_up(current)  # the balance fix stops early, but every aggregate up to the root may be stale
+
+    def rotate_left(self, og_root):
+        super().rotate_left(og_root)
+        self._refresh(og_root)
+        self._refresh(og_root.parent)
+
+    def rotate_right(self, og_root):
+        super().rotate_right(og_root)
+        self._refresh(og_root)
+        self._refresh(og_root.parent)
+
+
+class AggregateRBTree(AggregateMixin, RBTree):
+    """ A red black tree with O(log n) range aggregates, see AggregateMixin """
+
+    def _delete(self, del_node):
+        spliced = self._find_max(del_node.left) if (del_node.left and del_node.right) else del_node
+        parent = spliced.parent  # the node physically removed hangs off here; everything above it is stale
+        super()._delete(del_node)
+        self._refresh_up(parent)
+
+    def _rotate_left(self, og_root):
+        super()._rotate_left(og_root)
+        self._refresh(og_root)
+        self._refresh(og_root.parent)
+
+    def _rotate_right(self, og_root):
+        super()._rotate_right(og_root)
+        self._refresh(og_root)
+        self._refresh(og_root.parent)
+
+
+def _identity(value):
+    return value
@@ -1,5 +1,8 @@
 """A python binary search tree implementation."""
 
+import math
+from time import perf_counter
+
 from Tree import TreeNode
 from Tree import Tree
 
@@ -15,6 +18,7 @@ class BSTreeNode(TreeNode):
     value : Any
         The data this node holds.
     """
+    _fields = TreeNode._fields + ('height',)
 
     def __init__(self, val, parent=None):
         super().__init__(val, parent)
@@ -31,38 +35,108 @@ class BSTreeNode(TreeNode):
 
 class BSTree(Tree):
     """ A binary search tree """
-    def __init__(self, values=()):
+    _node_type = BSTreeNode
+
+    def __init__(self, values=(), scapegoat=False, alpha=0.75, lazy_delete=False, tombstone_ratio=0.5):
         """ Constructor for this bst
             Can take optional values (list, tuple, or set (all items must be same type)) to build initial tree
             ALLOWS DUPLICATES (simple implementation that always stores duplicates to the left)
+            With scapegoat=True the tree keeps its height within log base 1/alpha of its size: an insert that lands
+            deeper than that rebuilds the smallest subtree on its path that is out of alpha balance (0.5 < alpha < 1,
+            lower alpha means a shallower tree and more frequent rebuilds)
+            With lazy_delete=True deletes leave tombstones instead of relinking nodes, and the tree is compacted once
+            tombstones exceed tombstone_ratio of its entries (0 < tombstone_ratio <= 1, 1 leaves it to compact())
         """
+        if not 0.5 < alpha < 1:
+            raise ValueError("alpha must be between 0.5 and 1")
+        if not 0 < tombstone_ratio <= 1:
+            raise ValueError("tombstone_ratio must be in (0, 1]")
+        self.lazy_delete = lazy_delete
+        self.tombstone_ratio = tombstone_ratio
+        self.scapegoat = scapegoat
+        self.alpha = alpha
+        self._max_size = 0  # largest size since the last full rebuild, scapegoat mode rebuilds when deletes halve it
         super().__init__(values)
 
     def insert(self, new_val):
         """ Wrapper for insertNode that initiates the insertion by calling insertNode on root"""
+        self._snapshot = None
+        if self._hooks:
+            start = perf_counter()
+        self._size += 1
         if self.root is None:
-            self.root = BSTreeNode(new_val)
+            new_node = self.root = self._new_node(new_val)
         else:
-            self._insert(self.root, new_val)
+            new_node = self._insert(self.root, new_val)
+        if self.scapegoat:
+            self._max_size = max(self._max_size, self._size)
+            self._check_depth(new_node)
+        if self._hooks:
+            self._emit('insert', new_val, (new_node,), perf_counter() - start)
 
     def _insert(self, current, new_val):
-        """ Inserts a node storing the new_value into the BST"""
-        if new_val <= current.value:
-            if current.left:
-                self._insert(current.left, new_val)
-            else:
-                current.left = BSTreeNode(new_val, parent=current)
-        else:
-            if current.right:
-                self._insert(current.right, new_val)
+        """ Inserts a node storing the new_value into the BST, returning the new node. Walks down in a loop rather
+            than recursing (an unbalanced tree can be as deep as it is large), then fixes heights back up the path
+            until one doesn't change (stats.py has a counting copy of the descent) """
+        while True:
+            if new_val <= current.value:
+                if current.left is None:
+                    new_node = current.left = self._new_node(new_val, parent=current)
+                    break
+                current = current.left
             else:
-                current.right = BSTreeNode(new_val, parent=current)
-        current.height = self._height(current)
+                if current.right is None:
+                    new_node = current.right = self._new_node(new_val, parent=current)
+                    break
+                current = current.right
+        while current is not None:
+            height = current.height
+            self._fix_height(current)
+            if current.height == height:
+                break
+            current = current.parent
+        return new_node
+
+    def _check_depth(self, new_node):
+        """ Scapegoat mode: if new_node is deeper than log base 1/alpha of the size, rebuilds the lowest ancestor
+            whose subtree is out of alpha balance. One always exists on the path, and finding it only counts the
+            subtrees hanging off the path, which the rebuild pays for anyway.
+        """
+        depth = 0
+        node = new_node
+        while node.parent is not None:
+            depth += 1
+            node = node.parent
+        if depth <= math.log(self._size, 1 / self.alpha):
+            return
+        child, child_size = new_node, 1
+        node = new_node.parent
+        while node is not None:
+            sibling = node.right if child is node.left else node.left
+            size = child_size + 1 + self._subtree_size(sibling)
+            if child_size > self.alpha * size:
+                self._rebuild(node, size)
+                return
+            child, child_size = node, size
+            node = node.parent
 
     def delete(self, del_val):
         """Calls find to access the node to be deleted, passing it to _delete to do the actual removal"""
-        del_node = self._find(self.root, del_val)
-        self._delete(del_node)
+        self._snapshot = None
+        if self._hooks:
+            start = perf_counter()
+        if self.lazy_delete:
+            del_node = self._mark_deleted(del_val)
+        else:
+            del_node = self._find(self.root, del_val)
+            if del_node:
+                self._size -= 1
+            self._delete(del_node)
+            if self.scapegoat and self._size < self.alpha * self._max_size:
+                self.rebalance()
+                self._max_size = self._size
+        if self._hooks and del_node:
+            self._emit('delete', del_val, (del_node,), perf_counter() - start)
 
     def _delete(self, del_node):
         """ Removes the passed del_node from the tree, relinking around the removed node"""
@@ -81,16 +155,168 @@ class BSTree(Tree):
 
     def _find_max(self, current):
         """ Returns the node storing the greatest value in the subtree rooted at current """
-        if current.right is None:
-            return current
-        return self._find_max(current.right)
+        while current.right is not None:
+            current = current.right
+        return current
 
     def _update_path(self, current):
         """Travels up tree from current node to root, correcting the height at each node it stops at"""
-        if current is None:
-            return
-        current.height = self._height(current)
-        self._update_path(current.parent)
+        while current is not None:
+            self._fix_height(current)
+            current = current.parent
+
+    @staticmethod
+    def _fix_height(node):
+        """ Sets node.height from its children's stored heights, O(1) """
+        lh = node.left.height if node.left else 0
+        rh = node.right.height if node.right else 0
+        node.height = 1 + (lh if lh > rh else rh)
+
+    def rebalance(self):
+        """ Rebalances the whole tree in place with the Day-Stout-Warren algorithm, in O(n) time and O(1) extra
+            space: right rotations unfold the tree into a sorted vine, then rounds of left rotations on every other
+            vine node fold it back up into a tree whose levels are all full except the last
+        """
+        if self._hooks:
+            start = perf_counter()
+        n = 0
+        node = self.root
+        while node is not None:
+            if node.left is not None:
+                self._rotate_right(node)
+                node = node.parent
+            else:
+                n += 1
+                node = node.right
+        full = (1 << ((n + 1).bit_length() - 1)) - 1  # size of the largest perfect tree with at most n nodes
+        self._compress(n - full)  # hang the leftovers as the bottom level
+        while full > 1:
+            full //= 2
+            self._compress(full)
+        self._fix_heights()
+        if self._hooks:
+            self._emit('rebalance', None, (self.root,), perf_counter() - start)
+
+    def _compress(self, count):
+        """ Left rotates count alternate nodes down the right spine, starting at the root """
+        node = self.root
+        for _ in range(count):
+            self._rotate_left(node)
+            node = node.parent.right
+
+    def _fix_heights(self):
+        """ Recomputes every height bottom up, walking the tree in post order through parent links (no stack) """
+        prev, node = None, self.root
+        while node is not None:
+            if prev is node.parent:  # first visit, go down
+                nxt = node.left or node.right
+            elif prev is node.left and node.right is not None:
+                nxt = node.right
+            else:
+                nxt = None
+            if nxt is None:  # both children done
+                self._fix_height(node)
+                nxt = node.parent
+            prev, node = node, nxt
+
+    def _subtree_size(self, node):
+        """ Number of nodes in the subtree rooted at node """
+        size = 0
+        stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            size += 1
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+        return size
+
+    def _rebuild(self, top, size):
+        """ Relinks the size nodes of the subtree rooted at top into a perfectly balanced subtree, in place """
+        if self._hooks:
+            start = perf_counter()
+        parent = top.parent
+        nodes = []
+        stack = []
+        node = top
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                nodes.append(node)
+                node = node.right
+        new_top = self._link_balanced(nodes, 0, size)
+        new_top.parent = parent
+        if parent is None:
+            self.root = new_top
+        elif parent.left is top:
+            parent.left = new_top
+        else:
+            parent.right = new_top
+        self._update_path(parent)
+        if self._hooks:
+            self._emit('rebalance', top.value, (new_top,), perf_counter() - start)
+
+    def _link_balanced(self, nodes, lo, hi):
+        """ Links nodes[lo:hi] (in order) into a balanced subtree and returns its root """
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        node.left = self._link_balanced(nodes, lo, mid)
+        node.right = self._link_balanced(nodes, mid + 1, hi)
+        if node.left is not None:
+            node.left.parent = node
+        if node.right is not None:
+            node.right.parent = node
+        self._fix_height(node)
+        return node
+
+    def _rotate_left(self, og_root):
+        """ Rotate the subtree with root og_root to the left so that right subtree of og_root replaces og_root.
+            Heights are left for the caller to fix."""
+        if self._hooks:
+            start = perf_counter()
+        new_root = og_root.right
+        og_root.right = new_root.left
+        if new_root.left:
+            new_root.left.parent = og_root
+        self._relink(og_root, new_root)
+        new_root.left = og_root
+        og_root.parent = new_root
+        if self._hooks:
+            self._emit('rotate', og_root.value, (og_root, new_root), perf_counter() - start)
+
+    def _rotate_right(self, og_root):
+        """ Rotate the subtree with root og_root to the right so that left subtree of og_root replaces og_root.
+            Heights are left for the caller to fix."""
+        if self._hooks:
+            start = perf_counter()
+        new_root = og_root.left
+        og_root.left = new_root.right
+        if new_root.right:
+            new_root.right.parent = og_root
+        self._relink(og_root, new_root)
+        new_root.right = og_root
+        og_root.parent = new_root
+        if self._hooks:
+            self._emit('rotate', og_root.value, (og_root, new_root), perf_counter() - start)
+
+    def _relink(self, old, new):
+        """ Puts new where old hangs off its parent (or at the root) """
+        new.parent = old.parent
+        if old is self.root:
+            self.root = new
+        elif old is old.parent.left:
+            old.parent.left = new
+        else:
+            old.parent.right = new
+
+    def _init_built_node(self, node, left_height, right_height, depth):
+        node.height = 1 + max(left_height, right_height)
 
     def _replace(self, replacee_node, replacer_node):
         if replacee_node is self.root:
@@ -106,15 +332,8 @@ class BSTree(Tree):
                 replacer_node.parent = replacee_node.parent
             self._update_path(replacee_node.parent) # update the heights back up the path to the root
 
-    def _print_level(self, node, level, height):
-        if level < height:
-            if node is None:
-                print('\t' * level + "None")
-            else:
-                level_str = "{}({})".format(node.value, node.height)
-                print('\t' * level + level_str)
-                self._print_level(node._left, level+1, height)
-                self._print_level(node._right, level+1, height)
+    def _node_label(self, node):
+        return "{}({})".format(node.value, node.height)
 
 def main():
     s = input("Enter a list of numbers to build your own tree (Enter to use default list): ")
@@ -0,0 +1,248 @@
+"""A python B-tree: wide nodes holding sorted key lists, searched with bisect."""
+from bisect import bisect_left, bisect_right, insort_right
+from typing import Iterable
+
+
+class BTreeNode:
+    """A node for use in B-trees.
+
+    Attributes
+    ----------
+    keys : list
+        The sorted keys this node holds.
+    children : list of BTreeNode
+        len(keys) + 1 subtrees (children[i] holds the keys between keys[i - 1] and keys[i]), or [] for a leaf.
+    """
+
+    def __init__(self, keys=None, children=None):
+        self.keys = keys if keys is not None else []
+        self.children = children if children is not None else []
+
+    def __repr__(self):
+        """ Official string rep of this node"""
+        return "BTreeNode(keys={}, children={})".format(self.keys, len(self.children))
+
+
+class BTree:
+    """ A B-tree of the given order: every node has at most order children, and every node but the root at least
+        order / 2, so all leaves sit at the same depth of about log base order/2 of n. A lookup follows one node per
+        level and searches each node's key list with bisect (in C), where a binary tree hops one node per comparison.
+        Insert splits full nodes and delete tops up minimal ones on the way down (CLRS), so neither walks back up.
+    """
+    def __init__(self, values=(), order=64):
+        """ Constructor for this B-tree
+            Can take optional values (list, tuple, or set (all items must be same type)) to build initial tree
+            ALLOWS DUPLICATES
+            order is the maximum number of children per node (rounded down to an even number, at least 4)
+        """
+        if order < 4:
+            raise ValueError("order must be at least 4")
+        if not isinstance(values, Iterable):
+            raise TypeError("{} object is not iterable".format(values))
+        self.order = order
+        self._t = order // 2  # minimum degree: nodes hold t - 1 to 2t - 1 keys
+        self.root = BTreeNode()
+        self._size = 0
+        for v in values:
+            self.insert(v)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, search_val):
+        return self.find(search_val)
+
+    def __iter__(self):
+        """ Yields the keys in order, walking the nodes with a stack of (node, next child) pairs, one per level """
+        st = [(self.root, 0)]
+        while st:
+            node, i = st.pop()
+            if not node.children:
+                yield from node.keys
+                continue
+            if i:
+                yield node.keys[i - 1]
+            if i + 1 < len(node.children):
+                st.append((node, i + 1))
+            st.append((node.children[i], 0))
+
+    def find(self, search_val):
+        """ Returns true if search_val is stored in the tree, false otherwise """
+        node = self.root
+        while True:
+            keys = node.keys
+            i = bisect_left(keys, search_val)
+            if i < len(keys) and keys[i] == search_val:
+                return True
+            if not node.children:
+                return False
+            node = node.children[i]
+
+    def insert(self, new_val):
+        """ Inserts new_val, splitting every full node on the way down so there is always room below """
+        max_keys = 2 * self._t - 1
+        if len(self.root.keys) == max_keys:
+            self.root = BTreeNode(children=[self.root])
+            self._split_child(self.root, 0)
+        node = self.root
+        while node.children:
+            i = bisect_right(node.keys, new_val)
+            if len(node.children[i].keys) == max_keys:
+                self._split_child(node, i)
+                if not new_val < node.keys[i]:
+                    i += 1
+            node = node.children[i]
+        insort_right(node.keys, new_val)
+        self._size += 1
+
+    def _split_child(self, parent, i):
+        """ Splits the full parent.children[i] around its median key, which moves up into parent """
+        t = self._t
+        child = parent.children[i]
+        right = BTreeNode(child.keys[t:], child.children[t:])
+        parent.keys.insert(i, child.keys[t - 1])
+        parent.children.insert(i + 1, right)
+        del child.keys[t - 1:]
+        del child.children[t:]
+
+    def delete(self, del_val):
+        """ Removes one copy of del_val from the tree, if there is one. Every node the walk enters is first given
+            at least t keys (borrowing from a sibling or merging with it), so removing a key never underflows.
+        """
+        if not self.find(del_val):
+            return
+        t = self._t
+        node = self.root
+        while True:
+            keys = node.keys
+            i = bisect_left(keys, del_val)
+            found = i < len(keys) and keys[i] == del_val
+            if not node.children:
+                del keys[i]
+                break
+            if found:
+                left, right = node.children[i], node.children[i + 1]
+                if len(left.keys) >= t:  # replace with the predecessor, then delete that from the left subtree
+                    keys[i] = del_val = self._max_key(left)
+                    node = left
+                elif len(right.keys) >= t:
+                    keys[i] = del_val = self._min_key(right)
+                    node = right
+                else:
+                    node = self._merge(node, i)
+                continue
+            child = node.children[i]
+            if len(child.keys) < t:
+                if i > 0 and len(node.children[i - 1].keys) >= t:
+                    self._borrow_left(node, i)
+                elif i < len(keys) and len(node.children[i + 1].keys) >= t:
+                    self._borrow_right(node, i)
+                else:
+                    child = self._merge(node, i - 1 if i > 0 else i)
+            node = child
+        self._size -= 1
+
+    def _merge(self, parent, i):
+        """ Merges parent.children[i + 1] and the key between them into parent.children[i], returning it. An emptied
+            root is replaced by the merged child. """
+        left = parent.children[i]
+        right = parent.children.pop(i + 1)
+        left.keys.append(parent.keys.pop(i))
+        left.keys.extend(right.keys)
+        left.children.extend(right.children)
+        if parent is self.root and not parent.keys:
+            self.root = left
+        return left
+
+    @staticmethod
+    def _borrow_left(parent, i):
+        """ Rotates a key from parent.children[i - 1] through parent into parent.children[i] """
+        child, sibling = parent.children[i], parent.children[i - 1]
+        child.keys.insert(0, parent.keys[i - 1])
+        parent.keys[i - 1] = sibling.keys.pop()
+        if sibling.children:
+            child.children.insert(0, sibling.children.pop())
+
+    @staticmethod
+    def _borrow_right(parent, i):
+        """ Rotates a key from parent.children[i + 1] through parent into parent.children[i] """
+        child, sibling = parent.children[i], parent.children[i + 1]
+        child.keys.append(parent.keys[i])
+        parent.keys[i] = sibling.keys.pop(0)
+        if sibling.children:
+            child.children.append(sibling.children.pop(0))
+
+    @staticmethod
+    def _max_key(node):
+        while node.children:
+            node = node.children[-1]
+        return node.keys[-1]
+
+    @staticmethod
+    def _min_key(node):
+        while node.children:
+            node = node.children[0]
+        return node.keys[0]
+
+    def height(self):
+        """ Number of levels of nodes (every leaf is at the same depth); 0 for an empty tree """
+        if not self._size:
+            return 0
+        levels = 1
+        node = self.root
+        while node.children:
+            node = node.children[0]
+            levels += 1
+        return levels
+
+    def to_list(self, order):
+        """ Returns a list representation of the tree with the specified order.
+            Order must be one of: {'in_order', 'pre_order', 'post_order', 'level_order'}
+            pre and post order list each node's keys (in order) before / after its subtrees.
+        """
+        if order == 'in_order':
+            return self._in_order(self.root)
+        elif order == 'pre_order':
+            return self._pre_order(self.root)
+        elif order == 'post_order':
+            return self._post_order(self.root)
+        elif order == 'level_order':
+            return self._level_order()
+        else:
+            raise NotImplementedError()
+
+    def _in_order(self, node):
+        """Returns in order list representation of the subtree (recursion depth is only the tree's height)"""
+        if not node.children:
+            return list(node.keys)
+        out = []
+        for child, key in zip(node.children, node.keys):
+            out.extend(self._in_order(child))
+            out.append(key)
+        out.extend(self._in_order(node.children[-1]))
+        return out
+
+    def _pre_order(self, node):
+        out = list(node.keys)
+        for child in node.children:
+            out.extend(self._pre_order(child))
+        return out
+
+    def _post_order(self, node):
+        out = []
+        for child in node.children:
+            out.extend(self._post_order(child))
+        out.extend(node.keys)
+        return out
+
+    def _level_order(self):
+        out = []
+        level = [self.root]
+        while level:
+            for node in level:
+                out.extend(node.keys)
+            level = [child for node in level for child in node.children]
+        return out
+
+    def __repr__(self):
+        return "BTree(order={}, n={}, height={})".format(self.order, self._size, self.height())
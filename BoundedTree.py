@@ -0,0 +1,71 @@
+"""A python AVL tree that only keeps the k largest (or smallest) values it has been given."""
+from typing import Iterable
+
+from AVLTree import AVLTree
+
+
+class BoundedTree(AVLTree):
+    """ An AVL tree holding at most k values, for top-k over unbounded streams
+
+        Once the tree is full, a new value is compared once against the cached boundary node (the smallest value
+        kept when keep='largest', the largest when keep='smallest'). Values that don't beat it are rejected without
+        touching the tree; values that do evict the boundary in O(log n).
+    """
+    _bulk_build = False  # every value has to go through insert to be checked against the boundary
+    def __init__(self, k, values=(), keep='largest', multiset=False):
+        """ Constructor for this bounded tree
+            k is the maximum number of values kept, keep is 'largest' or 'smallest'.
+            values may be any iterable (including a generator); it is consumed one value at a time, never copied.
+        """
+        if keep not in ('largest', 'smallest'):
+            raise ValueError("keep must be 'largest' or 'smallest'")
+        if k < 0:
+            raise ValueError("k must be >= 0")
+        if not isinstance(values, Iterable):
+            raise TypeError("{} object is not iterable".format(values))
+        self.k = k
+        self.keep = keep
+        self._boundary = None
+        super().__init__((), multiset=multiset)
+        for v in values:
+            self.insert(v)
+
+    def insert(self, new_val):
+        """ Inserts new_val if it qualifies, evicting the boundary value if the tree is full.
+            Returns True if the value was kept, False if it was rejected.
+        """
+        if self._size >= self.k:
+            boundary = self._boundary
+            if boundary is None:  # k == 0
+                return False
+            if self.keep == 'largest':
+                if not new_val > boundary.value:
+                    return False
+            elif not new_val < boundary.value:
+                return False
+            super().delete(boundary.value)
+        super().insert(new_val)
+        self._boundary = self._find_boundary()
+        return True
+
+    def delete(self, del_val):
+        """Removes del_val from the tree (freeing a slot), refreshing the cached boundary"""
+        super().delete(del_val)
+        self._boundary = self._find_boundary()
+
+    def boundary(self):
+        """ Returns the value a new value has to beat once the tree is full (None if the tree is empty) """
+        return self._boundary.value if self._boundary is not None else None
+
+    def _find_boundary(self):
+        """ Returns the node with the smallest value (keep='largest') or largest value (keep='smallest') """
+        current = self.root
+        if current is None:
+            return None
+        if self.keep == 'largest':
+            while current.left is not None:
+                current = current.left
+        else:
+            while current.right is not None:
+                current = current.right
+        return current
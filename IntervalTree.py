@@ -0,0 +1,108 @@
+"""A python interval tree: an AVL tree of closed intervals augmented with the maximum endpoint of each subtree."""
+from AggregateTree import AggregateAVLTree, Monoid
+from AVLTree import AVLTreeNode
+
+
+def _later(a, b):
+    """ The greater of two interval ends, where None (an empty subtree) is less than any end """
+    if a is None or (b is not None and a < b):
+        return b
+    return a
+
+
+def _start(interval):
+    return interval[0]
+
+
+def _end(interval):
+    return interval[1]
+
+
+LATEST_END = Monoid(_later, None)  # unlike MAX, works for ends of any comparable type (dates...), not just numbers
+
+
+class IntervalTreeNode(AVLTreeNode):
+    """A node for use in interval trees.
+
+    Attributes
+    ----------
+    value : (lo, hi)
+        The interval this node holds.
+    max_end : Any
+        The greatest hi of any interval in the subtree rooted at this node (the node's aggregate, agg).
+    """
+
+    @property
+    def max_end(self):
+        return self.agg
+
+    def __repr__(self):
+        return super().__repr__()[:-1] + ", max_end={})".format(self.agg)
+
+
+class IntervalTree(AggregateAVLTree):
+    """ An AVL tree of closed intervals (lo, hi) ordered by (lo, hi), answering overlap queries
+
+        An aggregate tree whose nodes cache the largest hi in their subtree (node.agg), which lets a query skip any
+        subtree that ends before the query starts. See AggregateMixin for how it is kept up to date; aggregate(lo, hi)
+        returns the latest end of the intervals starting in [lo, hi].
+    """
+    _node_type = IntervalTreeNode
+
+    def __init__(self, intervals=()):
+        """ Constructor for this interval tree
+            Can take optional intervals (an iterable of (lo, hi) pairs with lo <= hi) to build the initial tree
+        """
+        super().__init__(intervals, monoid=LATEST_END, key=_start, measure=_end)
+
+    @classmethod
+    def from_sorted(cls, intervals):
+        """ Builds a tree from intervals that are already sorted by (lo, hi) in O(n), without any rotations """
+        intervals = [_checked(interval) for interval in intervals]
+        tree = cls()
+        tree.root, _ = tree._build_sorted(iter(intervals), len(intervals))
+        tree._size = len(intervals)
+        return tree
+
+    def insert(self, interval):
+        """ Inserts the closed interval (lo, hi) """
+        super().insert(_checked(interval))
+
+    def delete(self, interval):
+        """ Removes the interval (lo, hi), if it is in the tree """
+        super().delete(_checked(interval))
+
+    def overlapping(self, lo, hi=None):
+        """ Returns the intervals overlapping the point lo, or the closed range [lo, hi] if hi is given, in sorted
+            order. Only subtrees that can hold an overlap are entered, so this visits O((k + 1) log n) nodes for k
+            results instead of scanning the whole tree.
+        """
+        if hi is None:
+            hi = lo
+        result = []
+        st = []
+        node = self.root
+        while st or node is not None:
+            if node is not None:
+                if node.agg < lo:  # everything in this subtree ends before the query starts
+                    node = None
+                    continue
+                st.append(node)
+                node = node.left
+            else:
+                node = st.pop()
+                start, end = node.value
+                if hi < start:  # this and everything to its right starts after the query ends
+                    break
+                if lo <= end:
+                    result.append(node.value)
+                node = node.right
+        return result
+
+
+def _checked(interval):
+    """ Returns interval as a (lo, hi) tuple, raising ValueError if lo > hi """
+    lo, hi = interval
+    if hi < lo:
+        raise ValueError("interval ({}, {}) ends before it starts".format(lo, hi))
+    return (lo, hi)
@@ -1,4 +1,5 @@
 """A python Red Black balanced binary search tree implementation."""
+from time import perf_counter
 from typing import Iterable
 
 from Tree import TreeNode
@@ -7,6 +8,11 @@ from Tree import Tree
 RED = 'RED'
 BLACK = 'BLACK'
 
+
+def _is_black(node):
+    """ None children count as black leaves """
+    return node is None or node.color == BLACK
+
 class RBTreeNode(TreeNode):
     """A node for use in binary search trees.
 
@@ -17,6 +23,7 @@ class RBTreeNode(TreeNode):
     color: {RED, BLACK}
         The color of this node: red or black
     """
+    _fields = TreeNode._fields + ('color',)
 
     def __init__(self, val, color=RED, parent=None):
         if color not in (RED, BLACK):
@@ -59,41 +66,117 @@ class RBTreeNode(TreeNode):
 
 class RBTree(Tree):
     """ A binary search tree """
-    def __init__(self, values=()):
+    _node_type = RBTreeNode
+
+    def __init__(self, values=(), multiset=False, top_down=False):
         """ Constructor for this bst
             Can take optional values (list, tuple, or set (all items must be same type)) to build initial tree
             ALLOWS DUPLICATES (simple implementation that always stores duplicates to the right)
+            With multiset=True duplicates are instead counted on the node already holding that value
+            With top_down=True inserts split 4-nodes on the way down in a single iterative pass (see
+            _insert_top_down) instead of placing a leaf and fixing colors back up the path
         """
+        self.multiset = multiset
+        self.top_down = top_down
         super().__init__(values)
 
     def insert(self, new_val):
         """ Wrapper for _insert that initiates the insertion by calling _insert on root"""
+        self._snapshot = None
+        if self._hooks:
+            start = perf_counter()
+        self._size += 1
+        if self.multiset:
+            new_node = self._find(self.root, new_val)
+            if new_node is not None:
+                new_node.count += 1
+                if self._hooks:
+                    self._emit('insert', new_val, (new_node,), perf_counter() - start)
+                return
         if self.root is None:
-            self.root = RBTreeNode(new_val, color=BLACK)  # root has to be black
+            new_node = self.root = self._new_node(new_val, color=BLACK)  # root has to be black
+        elif self.top_down:
+            new_node = self._insert_top_down(new_val)
         else:
-            self._insert(self.root, new_val)
+            new_node = self._insert(self.root, new_val)
+        if self._hooks:
+            self._emit('insert', new_val, (new_node,), perf_counter() - start)
 
     def _insert(self, current, new_val):
-        """ Inserts a red node storing the new_value into the BST"""
+        """ Inserts a red node storing the new_value into the BST, returning the new node"""
         if new_val <= current.value:
             if current.left:
-                self._insert(current.left, new_val)
-            else:
-                current.left = RBTreeNode(new_val, parent=current)  # new nodes are red by default
-                self._fix_rb_prop(current.left)
+                return self._insert(current.left, new_val)
+            new_node = current.left = self._new_node(new_val, parent=current)  # new nodes are red by default
         else:
             if current.right:
-                self._insert(current.right, new_val)
+                return self._insert(current.right, new_val)
+            new_node = current.right = self._new_node(new_val, parent=current)  # new nodes are red by default
+        self._fix_rb_prop(new_node)
+        return new_node
+
+    def _insert_top_down(self, new_val):
+        """ Inserts a red node storing new_val in one pass down from the root, returning the new node.
+            Every black node met with two red children (a 4-node) is split on the way by a color flip; if that
+            leaves it red under a red parent, one rotation fixes it on the spot. Since no 4-node is left above the
+            insertion point, the uncle of any double red is black and nothing ever has to travel back up.
+            stats.py has a counting copy of this method, keep the two in step.
+        """
+        node = self.root
+        while True:
+            left = node.left
+            if left is not None and left.color == RED:
+                right = node.right
+                if right is not None and right.color == RED:
+                    node.color = RED
+                    left.color = right.color = BLACK
+                    if node.parent is not None and node.parent.color == RED:
+                        self._fix_red_parent(node)
+            if new_val <= node.value:
+                if node.left is None:
+                    new_node = node.left = self._new_node(new_val, parent=node)
+                    break
+                node = node.left
             else:
-                current.right = RBTreeNode(new_val, parent=current)  # new nodes are red by default
-                self._fix_rb_prop(current.right)
+                if node.right is None:
+                    new_node = node.right = self._new_node(new_val, parent=node)
+                    break
+                node = node.right
+        self._fix_red_parent(new_node)
+        self.root.color = BLACK
+        return new_node
+
+    def _fix_red_parent(self, current):
+        """ Top-down insertion: if the red node current has a red parent, rotates around the grandparent (twice if
+            current is an inner child) so the middle of the three becomes a black subtree root with red children """
+        p_node = current.parent
+        if p_node is None or p_node.color == BLACK:
+            return
+        if self._hooks:
+            start = perf_counter()
+        gp_node = p_node.parent  # a red node is never the root
+        if p_node is gp_node.left:
+            if current is p_node.right:
+                self._rotate_left(p_node)
+                p_node = current
+            self._rotate_right(gp_node)
+        else:
+            if current is p_node.left:
+                self._rotate_right(p_node)
+                p_node = current
+            self._rotate_left(gp_node)
+        p_node.color = BLACK
+        gp_node.color = RED
+        if self._hooks:
+            self._emit('rebalance', current.value, (current, p_node, gp_node), perf_counter() - start)
 
     def _fix_rb_prop(self, current):
         """Fixes the rb properties of the tree after an insert of current node"""
         p_node = current.parent
-        print(current)
         if (not p_node) or (p_node.color == BLACK):
             return  # if the parent of the current node (newly inserted) is black, no properties are violated
+        if self._hooks:
+            start = perf_counter()
         gp_node = p_node.parent # grandparent of the newly inserted node (p_node will always have a parent because it's red so not root)
         # otherwise, we're in a double red situation
         sib_node = p_node.get_sibling()
@@ -101,27 +184,138 @@ class RBTree(Tree):
             if p_node is gp_node.left:
                 if current is p_node.left:  # rotate p node right and recolor it black, color gp node red
                     self._rotate_right(gp_node)
+                    p_node.color = BLACK
                 else:
                     self._rotate_left(p_node)
                     self._rotate_right(gp_node)
-                max(current, p_node).color = BLACK
+                    current.color = BLACK  # current ends up on top (compare by position, values may tie)
             else:
                 if current is p_node.right:
                     self._rotate_left(gp_node)
+                    p_node.color = BLACK
                 else:
                     self._rotate_right(p_node)
                     self._rotate_left(gp_node)
-                min(current, p_node).color = BLACK
+                    current.color = BLACK
             gp_node.color = RED
         else: # sibling is red
             p_node.color = BLACK
             sib_node.color = BLACK
             if (gp_node.parent):  # as long as gp isn't the root, change color to red
                 gp_node.color = RED
+        if self._hooks:
+            self._emit('rebalance', current.value, (current, p_node, gp_node), perf_counter() - start)
         self._fix_rb_prop(gp_node)  # recolor might have created double-red between gp & gp's parent so recursively fix
 
+    def delete(self, del_val):
+        """Calls find to access the node to be deleted, passing it to _delete to do the actual removal"""
+        self._snapshot = None
+        if self._hooks:
+            start = perf_counter()
+        del_node = self._find(self.root, del_val)
+        if del_node:
+            self._size -= 1
+            if del_node.count > 1:  # multiset node, just drop one copy
+                del_node.count -= 1
+            else:
+                self._delete(del_node)
+        if self._hooks and del_node:
+            self._emit('delete', del_val, (del_node,), perf_counter() - start)
+
+    def _delete(self, del_node):
+        """ Removes the passed del_node from the tree, relinking around it and then fixing the rb properties"""
+        if del_node.left and del_node.right: # 2 children so swap in the predecessor, which has at most one child
+            pre_node = self._find_max(del_node.left)
+            del_node.value = pre_node.value
+            if self.multiset:
+                del_node.count = pre_node.count
+            del_node = pre_node
+        child = del_node.left if del_node.left else del_node.right
+        parent = del_node.parent
+        self._replace(del_node, child)
+        if del_node.color == BLACK:
+            if child and child.color == RED:  # a red child can take over the removed black
+                child.color = BLACK
+            else:
+                self._fix_double_black(child, parent)
+
+    def _fix_double_black(self, current, parent):
+        """Fixes the rb properties after a black node was removed from above current (which may be None), leaving
+        every path through current one black node short"""
+        if self._hooks:
+            start = perf_counter()
+            first = (current, parent)
+        while current is not self.root and (current is None or current.color == BLACK):
+            if current is parent.left:
+                sib_node = parent.right
+                if sib_node.color == RED:  # rotate the red sibling above parent so current gets a black sibling
+                    sib_node.color = BLACK
+                    parent.color = RED
+                    self._rotate_left(parent)
+                    sib_node = parent.right
+                if _is_black(sib_node.left) and _is_black(sib_node.right):  # push the missing black up a level
+                    sib_node.color = RED
+                    current = parent
+                    parent = current.parent
+                else:
+                    if _is_black(sib_node.right):
+                        sib_node.left.color = BLACK
+                        sib_node.color = RED
+                        self._rotate_right(sib_node)
+                        sib_node = parent.right
+                    sib_node.color = parent.color
+                    parent.color = BLACK
+                    sib_node.right.color = BLACK
+                    self._rotate_left(parent)
+                    current = self.root
+            else:
+                sib_node = parent.left
+                if sib_node.color == RED:
+                    sib_node.color = BLACK
+                    parent.color = RED
+                    self._rotate_right(parent)
+                    sib_node = parent.left
+                if _is_black(sib_node.left) and _is_black(sib_node.right):
+                    sib_node.color = RED
+                    current = parent
+                    parent = current.parent
+                else:
+                    if _is_black(sib_node.left):
+                        sib_node.right.color = BLACK
+                        sib_node.color = RED
+                        self._rotate_left(sib_node)
+                        sib_node = parent.left
+                    sib_node.color = parent.color
+                    parent.color = BLACK
+                    sib_node.left.color = BLACK
+                    self._rotate_right(parent)
+                    current = self.root
+        if current:
+            current.color = BLACK
+        if self._hooks:
+            self._emit('rebalance', first[1].value if first[1] else None, first, perf_counter() - start)
+
+    def _find_max(self, current):
+        """ Returns the node storing the greatest value in the subtree rooted at current """
+        while current.right is not None:
+            current = current.right
+        return current
+
+    def _replace(self, replacee_node, replacer_node):
+        """ replaces replacee_node with replacer_node in replacee_node's parent """
+        if replacee_node is self.root:
+            self.root = replacer_node
+        elif replacee_node is replacee_node.parent.left:
+            replacee_node.parent.left = replacer_node
+        else:
+            replacee_node.parent.right = replacer_node
+        if replacer_node is not None:
+            replacer_node.parent = replacee_node.parent
+
     def _rotate_left(self, og_root):
         """ Rotate the subtree with root og_root to the left so that right subtree of og_root replaces og_root"""
+        if self._hooks:
+            start = perf_counter()
         new_root = og_root.right
         og_root.right = new_root.left
         if new_root.left:
@@ -136,15 +330,19 @@ class RBTree(Tree):
                 og_root.parent.right = new_root
         new_root.left = og_root
         og_root.parent = new_root
+        if self._hooks:
+            self._emit('rotate', og_root.value, (og_root, new_root), perf_counter() - start)
 
     def _rotate_right(self, og_root):
         """Rotate the subtree with root og_root to the right so that left subtree of og_root replaces og_root"""
+        if self._hooks:
+            start = perf_counter()
         new_root = og_root.left
         og_root.left = new_root.right
         if new_root.right:
             new_root.right.parent = og_root
         new_root.parent = og_root.parent
-        if og_root.value == self.root.value:  # og_root is tree root
+        if og_root is self.root:  # og_root is tree root
             self.root = new_root
         else:
             if og_root is og_root.parent.right:
@@ -153,21 +351,26 @@ class RBTree(Tree):
                 og_root.parent.left = new_root
         new_root.right = og_root
         og_root.parent = new_root
+        if self._hooks:
+            self._emit('rotate', og_root.value, (og_root, new_root), perf_counter() - start)
 
-    def _print_level(self, node, level, height):
-        if level < height:
-            if node is None:
-                print('\t' * level + "NONE")
-            else:
-                level_str = "{}({})".format(node.value, node.color)
-                print('\t' * level + level_str)
-                self._print_level(node._left, level + 1, height)
-                self._print_level(node._right, level + 1, height)
+    def _build_sorted(self, values, n, depth=0):
+        if depth == 0:  # whole tree: only its deepest level is red, and only if that level isn't full
+            self._red_depth = n.bit_length() - 1 if (n + 1) & n else -1
+        return super()._build_sorted(values, n, depth)
+
+    def _init_built_node(self, node, left_height, right_height, depth):
+        """ Every null link of a built tree sits on its last two levels, so coloring just the last level red (when
+            it is partial) gives every path the same number of black nodes """
+        node.color = RED if depth == self._red_depth else BLACK
+
+    def _node_label(self, node):
+        return "{}({})".format(node.value, node.color)
 
     def __repr__(self):
         '''From James Collins'''
         em_dash = '\u2014'
-        max_depth = min(5, self.height())
+        max_depth = self._bounded_height(5)
         value_width = 3  # Must be odd.
         node_width = value_width + 2  # Add space for parentheses
         print_width = (node_width + 1) * 2 ** (max_depth - 1) - 1
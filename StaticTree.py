@@ -0,0 +1,157 @@
+"""An immutable, read-optimized search tree stored as a contiguous array in Eytzinger (BFS) order."""
+from array import array
+
+
+class StaticTree:
+    """ A read-only search tree laid out implicitly in a list
+
+        Slot k holds the root of a subtree whose children live in slots 2k and 2k + 1 (slot 0 is unused), so a
+        search walks a single contiguous list instead of chasing TreeNode pointers. Searches never branch on
+        equality: each step descends by the result of one comparison and the answer is recovered from the bits of
+        the final index.
+    """
+    def __init__(self, values=(), presorted=False):
+        """ Constructor for this static tree
+            Takes values (any iterable of mutually comparable items). Pass presorted=True if the values are already
+            in ascending order (eg. the in order traversal of another tree) to skip sorting.
+        """
+        values = list(values) if presorted else sorted(values)
+        n = len(values)
+        self._n = n
+        self._hash = None
+        self._keys = [None] * (n + 1)
+        self._order = array('q', [0]) * (n + 1)  # in order position (rank) of the key stored in each slot
+        i = 0
+        k = 1
+        st = []
+        while st or k <= n:  # in order walk of the implicit tree, handing out the sorted values as we go
+            if k <= n:
+                st.append(k)
+                k = 2 * k
+            else:
+                k = st.pop()
+                self._keys[k] = values[i]
+                self._order[k] = i
+                i += 1
+                k = 2 * k + 1
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, search_val):
+        return self.find(search_val)
+
+    def __iter__(self):
+        """ Yields the keys in order, walking the implicit tree """
+        keys = self._keys
+        n = self._n
+        k = 1
+        st = []
+        while st or k <= n:
+            if k <= n:
+                st.append(k)
+                k = 2 * k
+            else:
+                k = st.pop()
+                yield keys[k]
+                k = 2 * k + 1
+
+    def __eq__(self, other):
+        """ Static trees are equal when they hold the same keys (which also fixes their shape) """
+        if not isinstance(other, StaticTree):
+            return NotImplemented
+        return self._n == other._n and self._keys == other._keys
+
+    def __hash__(self):
+        """ Hash of the keys in slot order, computed on first use and cached (the tree never changes) """
+        if self._hash is None:
+            self._hash = hash(tuple(self._keys))
+        return self._hash
+
+    def insert(self, new_val):
+        raise TypeError("StaticTree is immutable")
+
+    def delete(self, del_val):
+        raise TypeError("StaticTree is immutable")
+
+    def _lower_bound(self, search_val):
+        """ Returns the slot holding the smallest key >= search_val, or 0 if every key is smaller """
+        keys = self._keys
+        n = self._n
+        k = 1
+        while k <= n:
+            k = 2 * k + (keys[k] < search_val)
+        return k >> (~k & (k + 1)).bit_length()  # undo the right turns taken after the last left turn
+
+    def _upper_floor(self, search_val):
+        """ Returns the slot holding the greatest key <= search_val, or 0 if every key is greater """
+        keys = self._keys
+        n = self._n
+        k = 1
+        while k <= n:
+            k = 2 * k + (keys[k] <= search_val)
+        return k >> (k & -k).bit_length()  # undo the left turns taken after the last right turn
+
+    def find(self, search_val):
+        """ Returns true if search_val is stored in the tree, false otherwise """
+        k = self._lower_bound(search_val)
+        return k != 0 and self._keys[k] == search_val
+
+    def ceiling(self, search_val):
+        """ Returns the smallest key >= search_val, or None if there is no such key """
+        return self._keys[self._lower_bound(search_val)]
+
+    def floor(self, search_val):
+        """ Returns the greatest key <= search_val, or None if there is no such key """
+        return self._keys[self._upper_floor(search_val)]
+
+    def rank(self, search_val):
+        """ Returns the number of keys strictly less than search_val """
+        k = self._lower_bound(search_val)
+        return self._order[k] if k else self._n
+
+    def height(self):
+        """ Height of the implicit tree (it is always complete, so this is ceil(log2(n + 1))) """
+        return self._n.bit_length()
+
+    def to_list(self, order):
+        """ Returns a list representation of the tree with the specified order.
+            Order must be one of: {'in_order', 'pre_order', 'post_order', 'level_order'}
+        """
+        keys = self._keys
+        n = self._n
+        if order == 'level_order':
+            return keys[1:]
+        elif order == 'in_order':
+            out = [None] * n
+            for k in range(1, n + 1):
+                out[self._order[k]] = keys[k]
+            return out
+        elif order == 'pre_order':
+            out = []
+            st = [1] if n else []
+            while st:
+                k = st.pop()
+                out.append(keys[k])
+                if 2 * k + 1 <= n:
+                    st.append(2 * k + 1)
+                if 2 * k <= n:
+                    st.append(2 * k)
+            return out
+        elif order == 'post_order':
+            out = []
+            st = [1] if n else []
+            while st:  # node, right, left order reversed is left, right, node
+                k = st.pop()
+                out.append(keys[k])
+                if 2 * k <= n:
+                    st.append(2 * k)
+                if 2 * k + 1 <= n:
+                    st.append(2 * k + 1)
+            out.reverse()
+            return out
+        else:
+            raise NotImplementedError()
+
+    def __repr__(self):
+        return "StaticTree(n={})".format(self._n)
@@ -1,7 +1,24 @@
 """Base binary tree class"""
+import asyncio
+import gc
+import heapq
+import os
+import sys
+import tracemalloc
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from contextlib import contextmanager
+from copy import deepcopy
+from itertools import chain, groupby, zip_longest
 from typing import Iterable
 from node import Node
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the batch lookups fall back to bisect over a plain list
+    np = None
+
 class TreeNode(Node):
     """A node for use in binary search trees.
 
@@ -9,7 +26,12 @@ class TreeNode(Node):
     ----------
     value : Any
         The data this node holds.
+    count : int
+        How many copies of value this node stands for. Always 1 unless the tree is a multiset, where it is only
+        stored on the instance once it differs from the class default.
     """
+    count = 1
+    _fields = ('value',)  # attributes copy() and pickling carry over besides the links and count, see Tree._clone
 
     def __init__(self, val, parent=None):
         if not hasattr(val, '__le__'):
@@ -67,9 +89,126 @@ class TreeNode(Node):
         node_rep += ", parent=TreeNode({}))".formate(self.parent.value) if self.parent else ", parent=None)"
         return node_rep
 
+TreeEvent = namedtuple('TreeEvent', ['kind', 'value', 'nodes', 'elapsed'])
+TreeEvent.__doc__ = """ Passed to hooks registered with Tree.on_insert/on_delete/on_rotate/on_rebalance.
+    kind is one of 'insert', 'delete', 'rotate', 'rebalance'; value is the value inserted, deleted or at the node
+    being rotated/rebalanced; nodes are the affected nodes; elapsed is the duration of the mutation in seconds.
+"""
+
+HOOK_KINDS = ('insert', 'delete', 'rotate', 'rebalance')
+
+
+async def _cooperative(iterator, yield_every):
+    """ Re-yields iterator's items asynchronously, giving the event loop a turn after every yield_every items """
+    for i, item in enumerate(iterator, 1):
+        yield item
+        if i % yield_every == 0:
+            await asyncio.sleep(0)
+
+
+def _insert_all(tree, values):
+    """ Inserts values into tree and returns it; module level so a process pool can run it. The collector is paused
+        meanwhile: a full collection over the tree holds the GIL long enough to stall the event loop thread. """
+    with _gc_paused():
+        for v in values:
+            tree.insert(v)
+    return tree
+
+
+_NODES_PER_INSERT = 8  # copy() copies about this many nodes in the time one insert takes (~10 at 2*10^5 nodes)
+
+
+_LINKS = ('_left', '_right', '_parent')
+
+
+@contextmanager
+def _gc_paused():
+    """ Suspends the cyclic garbage collector. Creating a node per value otherwise triggers collections that each
+        walk the whole (parent-linked, so cyclic) node graph built so far, which costs more than the cloning itself
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _unpickle_tree(tree_cls, node_cls, state, refs, flat, fields=None):
+    """ Rebuilds a tree pickled by Tree.__reduce__ from its pre-order list of (child flags, node state) pairs, where
+        a node state holds the values of fields followed by the node's count (trees pickled before fields were
+        passed carry a dict of node attributes instead).
+        After a node without a left child, the next node in pre-order is the right child of the nearest node still
+        waiting for one, so a stack of those is all the shape information needed.
+    """
+    with _gc_paused():
+        return _unflatten(tree_cls, node_cls, state, refs, flat, fields)
+
+
+def _unflatten(tree_cls, node_cls, state, refs, flat, fields):
+    tree = tree_cls.__new__(tree_cls)
+    tree.__dict__.update(state)
+    wanted = {}
+    for name, index in refs.items():
+        wanted.setdefault(index, []).append(name)
+    rest = fields[1:] if fields is not None else ()
+    new_node = node_cls.__new__
+    pending = []  # nodes whose right child comes later
+    prev = prev_flags = None
+    for i, (flags, node_state) in enumerate(flat):
+        if prev is None:
+            parent = None
+        elif prev_flags & 1:
+            parent, left = prev, True
+        else:
+            parent, left = pending.pop(), False
+        node = new_node(node_cls)
+        if fields is None:
+            node.value = node_state['value']
+            node._left = node._right = None
+            node._parent = parent
+            for name, value in node_state.items():
+                if name != 'value' and name not in _LINKS:
+                    setattr(node, name, value)
+        else:  # attributes set in the order the constructor sets them, which keeps them inline on CPython 3.11+
+            node.value = node_state[0]
+            node._left = node._right = None
+            node._parent = parent
+            for name, value in zip(rest, node_state[1:-1]):
+                setattr(node, name, value)
+            if node_state[-1] != 1:
+                node.count = node_state[-1]
+        if parent is None:
+            pass
+        elif left:
+            parent._left = node
+        else:
+            parent._right = node
+        if flags & 2:
+            pending.append(node)
+        prev, prev_flags = node, flags
+        for name in wanted.get(i, ()):
+            setattr(tree, name, node)
+    return tree
+
+
 class Tree:
+    _node_type = TreeNode  # class of the nodes this tree creates, see _build_sorted
+    _stats = None  # TreeStats while counters are enabled, see enable_stats
+    _hooks = None  # kind -> list of callbacks, only created once a hook is registered
+    multiset = False  # when true, duplicates share one node and bump its count instead of getting their own
+    lazy_delete = False  # when true, deletes only mark nodes as tombstones (count 0), see _mark_deleted
+    tombstone_ratio = 0.5  # lazy_delete trees compact once tombstones exceed this fraction of the entries
+    _tombstones = 0  # nodes marked deleted but still linked into the tree
+    _node_extras = ()  # node attributes this tree sets on top of its node class's _fields (eg. AggregateMixin's agg)
+    _eq_settings = ()  # tree attributes two trees must agree on to compare equal, see __eq__
+    _bulk_build = True  # from_file may build sorted input directly, skipping insert (false if insert filters values)
+
     def __init__(self, values=()):
         self.root = None
+        self._size = 0  # number of values stored, counting duplicates
+        self._snapshot = None  # sorted copy of the values for batch lookups, dropped by every insert/delete
 
         if isinstance(values, Iterable) and values:
             values = list(values)
@@ -80,29 +219,233 @@ class Tree:
         else:
             raise TypeError("{} object is not iterable".format(values))
 
+    @classmethod
+    def from_file(cls, path, format='text', chunk_size=1 << 16, **kwargs):
+        """ Builds a tree (cls(**kwargs)) from a file of numbers, read chunk_size values (text: bytes) at a time.
+            format is 'text' (whitespace separated ints or floats) or 'int64' / 'float64' (raw native-endian
+            values, as written by array.tofile or numpy's tofile).
+            A first pass checks whether the values are sorted. If they are, a second pass streams them straight into
+            a height balanced tree in O(n); otherwise they are streamed through insert. Either way only one chunk is
+            held in memory besides the tree.
+        """
+        if format not in _FILE_FORMATS:
+            raise ValueError("format must be one of {}".format(sorted(_FILE_FORMATS)))
+        read = _FILE_FORMATS[format]
+        tree = cls(**kwargs)
+        n, distinct = _count_sorted(read(path, chunk_size)) if tree._bulk_build else (None, None)
+        if n is None:
+            for chunk in read(path, chunk_size):
+                for v in chunk:
+                    tree.insert(v)
+        else:
+            tree._fill_sorted(lambda: read(path, chunk_size), n, distinct)
+        return tree
+
+    @classmethod
+    def from_merged(cls, *trees, **kwargs):
+        """ Builds a tree (cls(**kwargs)) holding every value of trees (Trees, StaticTrees, BTrees or sorted
+            sequences) in O(n) plus the O(n log k) merge: their values are merged into one sorted stream (see merge)
+            that goes straight into a height balanced tree, with no insert or rebalancing. A multiset first walks
+            the merge once more to count its distinct values.
+        """
+        tree = cls(**kwargs)
+        if not tree._bulk_build:
+            for v in merge(*trees):
+                tree.insert(v)
+            return tree
+        n = sum(len(t) for t in trees)
+        distinct = sum(1 for _ in groupby(merge(*trees))) if tree.multiset else n
+        tree._fill_sorted(lambda: [merge(*trees)], n, distinct)
+        return tree
+
+    def _fill_sorted(self, chunks, n, distinct):
+        """ Builds this (empty) tree in O(n) out of n sorted values, distinct of them different. chunks() returns a
+            fresh iterable of lists of the values each time it is called: a multiset builds one node per distinct
+            value, then reads them again to set the counts.
+        """
+        if self.multiset:
+            self.root, _ = self._build_sorted((v for v, _ in _runs(chunks())), distinct)
+            for node, (_, count) in zip(self._iter_nodes(self.root), _runs(chunks())):
+                if count != 1:
+                    node.count = count
+        else:
+            self.root, _ = self._build_sorted(chain.from_iterable(chunks()), n)
+        self._size = n
+
+    def __len__(self):
+        return self._size
+
+    def __eq__(self, other):
+        """ Trees are equal when they are of the same class, with the same settings (_eq_settings), and have the
+            same shape holding the same values, counts and node fields (balance, color, height, aggregate...).
+            Both trees are walked node by node in lockstep, stopping at the first difference. See equal_keys to
+            ignore shape and class.
+        """
+        if not isinstance(other, Tree):
+            return NotImplemented
+        if type(self) is not type(other) or self._size != other._size:
+            return False
+        if any(getattr(self, name) != getattr(other, name) for name in self._eq_settings):
+            return False
+        fields = {}  # node class -> its fields after 'value'
+        st = [(self.root, other.root)]
+        while st:
+            a, b = st.pop()
+            if a is None or b is None:
+                if a is not b:
+                    return False
+                continue
+            if a.value != b.value or a.count != b.count or type(a) is not type(b):
+                return False
+            rest = fields.get(type(a))
+            if rest is None:
+                rest = fields[type(a)] = self._node_fields(type(a))[1:]
+            for name in rest:
+                if getattr(a, name) != getattr(b, name):
+                    return False
+            st.append((a.right, b.right))
+            st.append((a.left, b.left))
+        return True
+
+    __hash__ = None  # trees are mutable
+
+    def equal_keys(self, other):
+        """ Returns true if other (a tree, a StaticTree or any iterable in sorted order) holds the same values as
+            this tree, duplicates included, whatever its shape. The two in order streams are compared in lockstep
+            and the walk stops at the first difference; nothing is materialized.
+        """
+        if hasattr(other, '__len__') and len(other) != self._size:
+            return False
+        missing = object()
+        for a, b in zip_longest(self._iter_in_order(self.root), _iter_keys(other), fillvalue=missing):
+            if a is missing or b is missing or a != b:
+                return False
+        return True
+
     def find(self, search_val):
         """ Wrapper for findNode that initiates the search by calling findNode starting at the root """
+        if self.lazy_delete:
+            return self._find_live(search_val) is not None
         return self._find(self.root, search_val) is not None
 
     def _find(self, current, search_val):
-        """ Searches the BST for the passed search_val returning true if value found, false otherwise"""
-        if current is None:
+        """ Searches the subtree rooted at current for search_val, returning the node holding it or None. Walks down
+            in a loop rather than recursing, so an unbalanced BSTree can't run out of stack (stats.py counts the
+            nodes visited with a copy of this loop, keep the two in step) """
+        while current is not None:
+            if search_val == current.value:
+                break
+            current = current.left if search_val < current.value else current.right
+        return current
+
+    def count(self, search_val):
+        """ Returns the number of times search_val is stored in the tree (duplicates may sit on either side of an
+            equal node after rotations, so every equal node's subtrees are searched too)
+        """
+        total = 0
+        st = [self.root]
+        while st:
+            node = st.pop()
+            if node is None:
+                continue
+            if search_val < node.value:
+                st.append(node.left)
+            elif node.value < search_val:
+                st.append(node.right)
+            else:
+                total += node.count
+                st.append(node.left)
+                st.append(node.right)
+        return total
+
+    def _find_live(self, search_val):
+        """ Returns a node holding search_val that is not a tombstone, or None. Like count, every equal node's
+            subtrees are searched, since a tombstone may shadow a live duplicate below it (stats.py has a counting
+            copy of this loop)
+        """
+        found = None
+        st = [self.root]
+        while st:
+            node = st.pop()
+            if node is None:
+                continue
+            if search_val < node.value:
+                st.append(node.left)
+            elif node.value < search_val:
+                st.append(node.right)
+            elif node.count:
+                found = node
+                break
+            else:
+                st.append(node.left)
+                st.append(node.right)
+        return found
+
+    def _mark_deleted(self, del_val):
+        """ Lazy delete: drops one copy of del_val by decrementing its node's count, leaving a node whose count
+            reaches 0 in place as a tombstone. No relinking or rebalancing happens, so this costs one O(log n)
+            search. Compacts the tree once tombstones exceed tombstone_ratio of the entries. Returns the node, or
+            None if del_val isn't in the tree.
+        """
+        node = self._find_live(del_val)
+        if node is None:
             return None
-        elif search_val == current.value:
-            return current
-        elif search_val <= current.value:
-            return self._find(current.left, search_val)
-        return self._find(current.right, search_val)
+        node.count -= 1
+        self._size -= 1
+        if not node.count:
+            self._tombstones += 1
+        if self._tombstones > self.tombstone_ratio * (self._size + self._tombstones):
+            self.compact()
+        return node
+
+    def compact(self):
+        """ Rebuilds the tree without its tombstones in O(n), as a height balanced tree """
+        live = [(node.value, node.count) for node in self._iter_nodes(self.root) if node.count]
+        self.root, _ = self._build_sorted((value for value, _ in live), len(live))
+        if self.multiset:
+            for node, (_, count) in zip(self._iter_nodes(self.root), live):
+                if count != 1:
+                    node.count = count
+        self._tombstones = 0
+        self._snapshot = None
+
+    def rank(self, search_val):
+        """ Returns the number of values in the tree strictly less than search_val, counting duplicates.
+            Nodes don't keep subtree sizes, so this bisects the sorted snapshot batch lookups share: O(log n) while
+            the tree is unchanged, but the first rank after an insert or delete rebuilds the snapshot in O(n), which
+            makes alternating updates and ranks O(n) each. For that pattern keep an AggregateAVLTree with
+            measure=lambda v: 1, whose aggregate(lo, hi) counts the values in any range in O(log n).
+        """
+        return bisect_left(self._sorted_snapshot(), search_val)
+
+    def remove_one(self, del_val):
+        """ Removes a single copy of del_val from the tree, if there is one """
+        self.delete(del_val)
+
+    def remove_all(self, del_val):
+        """ Removes every copy of del_val from the tree """
+        if self.multiset and not self._hooks:  # with hooks every copy goes through delete, so each one is seen
+            node = self._find_live(del_val) if self.lazy_delete else self._find(self.root, del_val)
+            if node is not None:
+                self._size -= node.count - 1  # collapse the node to a single copy and delete that
+                node.count = 1
+                self.delete(del_val)
+        else:
+            while self.find(del_val):
+                self.delete(del_val)
 
     def height(self):
         """ Wrapper for heightNode that initiates the height calculation by calling heightNode on the root """
         return self._height(self.root)
 
     def _height(self, node):
-        """ Calculates the height of the tree from the passed current node """
-        if node is None:
-            return 0
-        return 1 + max(self._height(node.left), self._height(node.right))
+        """ Calculates the height of the tree from the passed current node, a level at a time (no recursion) """
+        height = 0
+        level = [node] if node is not None else []
+        while level:
+            height += 1
+            level = [child for n in level for child in (n.left, n.right) if child is not None]
+        return height
 
     def to_list(self, order):
         """ Returns a list representation of the tree with the specified order.
@@ -121,21 +464,19 @@ class Tree:
 
     def _in_order(self, node):
         """Returns in order list representation of tree"""
-        if node is None:
-            return []
-        return self._in_order(node.left) + [node.value] + self._in_order(node.right)
+        return list(self._iter_in_order(node))
 
     def _pre_order(self, node):
         """Returns pre order list representation of tree"""
         if node is None:
             return []
-        return [node.value] + self._pre_order(node.left) + self._pre_order(node.right)
+        return [node.value] * node.count + self._pre_order(node.left) + self._pre_order(node.right)
 
     def _post_order(self, node):
         """Returns post order list representation of tree"""
         if node is None:
             return []
-        return self._post_order(node.left) + self._post_order(node.right) + [node.value]
+        return self._post_order(node.left) + self._post_order(node.right) + [node.value] * node.count
 
     def _level_order(self):
         """Returns level order list representation of tree"""
@@ -146,30 +487,518 @@ class Tree:
         while st:
             curr = st[0] # get the first element off
             st = st[1:] # pop the first element off the 'stack'
-            tree_ls.append(curr.value) # store the node value in our list of nodes
+            tree_ls.extend([curr.value] * curr.count) # store the node value (once per copy) in our list of nodes
             if curr.left:   # put the left child onto the stack if exists
                 st.append(curr.left)
             if curr.right: # put the right child onto the stack if exists
                 st.append(curr.right)
         return tree_ls
 
-    def print_tree(self):
-        self._print_level(self.root, 0, self.height())
+    def _iter_in_order(self, node):
+        """Yields the values of the subtree rooted at node in order, using an explicit stack instead of recursion"""
+        st = []
+        while st or node is not None:
+            if node is not None:
+                st.append(node)
+                node = node.left
+            else:
+                node = st.pop()
+                if node.count == 1:
+                    yield node.value
+                else:  # multiset node standing for several copies, or a tombstone
+                    for _ in range(node.count):
+                        yield node.value
+                node = node.right
 
-    def _print_level(self, node, level, height):
-        if level < height:
-            if node is None:
-                print('\t' * level + "None")
+    def _iter_nodes(self, node):
+        """Yields the nodes of the subtree rooted at node in order, tombstones included"""
+        st = []
+        while st or node is not None:
+            if node is not None:
+                st.append(node)
+                node = node.left
+            else:
+                node = st.pop()
+                yield node
+                node = node.right
+
+    def _build_sorted(self, values, n, depth=0):
+        """ Builds a height balanced subtree out of the next n values of the iterator values (which must come in
+            sorted order) in O(n), returning (root, height). Values are consumed in order, so values may be a
+            stream. Each node is finished by _init_built_node once its children exist.
+        """
+        if n == 0:
+            return None, 0
+        left_n = (n - 1) // 2
+        left, left_height = self._build_sorted(values, left_n, depth + 1)
+        node = self._new_node(next(values))
+        if left is not None:
+            node.left = left
+            left.parent = node
+        right, right_height = self._build_sorted(values, n - 1 - left_n, depth + 1)
+        if right is not None:
+            node.right = right
+            right.parent = node
+        self._init_built_node(node, left_height, right_height, depth)
+        return node, 1 + max(left_height, right_height)
+
+    def _new_node(self, value, parent=None, **kwargs):
+        """ Creates a _node_type node for value. Inserts and _build_sorted make every node here, so a subclass can
+            give a node any per-node data (an aggregate...) from the moment it exists """
+        return self._node_type(value, parent=parent, **kwargs)
+
+    def _init_built_node(self, node, left_height, right_height, depth):
+        """ Sets any per-node bookkeeping (heights, balances, colors...) on a node made by _build_sorted """
+        pass
+
+    def _iter_range(self, lo=None, hi=None):
+        """Yields the values v with lo <= v <= hi in order (either bound may be None for no bound). Only the nodes on
+        the path down to lo and the nodes yielded are visited"""
+        st = []
+        node = self.root
+        while True:
+            while node is not None:  # stack the path down to lo, skipping subtrees entirely below it
+                if lo is not None and node.value < lo:
+                    node = node.right
+                else:
+                    st.append(node)
+                    node = node.left
+            if not st:
+                return
+            node = st.pop()
+            if hi is not None and hi < node.value:
+                return
+            if node.count == 1:
+                yield node.value
+            else:
+                for _ in range(node.count):
+                    yield node.value
+            node = node.right
+
+    async def aiter_in_order(self, yield_every=1000):
+        """ Async iterator over the values in order (async for v in tree.aiter_in_order()) that hands control back
+            to the event loop after every yield_every values. The tree must not be modified while it runs.
+        """
+        async for value in _cooperative(self._iter_in_order(self.root), yield_every):
+            yield value
+
+    async def aiter_range(self, lo=None, hi=None, yield_every=1000):
+        """ Async iterator over the values v with lo <= v <= hi in order, yielding to the event loop after every
+            yield_every values
+        """
+        async for value in _cooperative(self._iter_range(lo, hi), yield_every):
+            yield value
+
+    async def insert_many_async(self, values, yield_every=1000, executor=None):
+        """ Inserts every value, awaiting the event loop after each yield_every inserts so other tasks keep running.
+            With an executor (a concurrent.futures thread or process pool) the values are instead inserted off the
+            loop into a copy of the tree, settings and all, whose state then replaces this tree's. The copy is made
+            on the loop yield_every nodes at a time; inserts and deletes other tasks make on the tree while the
+            batch is built are recorded and replayed on the copy first, so none is lost. The values (and, for a
+            process pool, the tree) must be picklable.
+            The batch is inserted in place instead when copying the tree would take longer than inserting it (a
+            batch much smaller than the tree), when the tree changes while it is being copied, and when hooks are
+            registered, so they see every insert.
+        """
+        values = list(values)
+        if executor is None or self._hooks or len(values) * _NODES_PER_INSERT < self._size:
+            await self._insert_in_place(values, yield_every)
+            return
+        mutations = []
+
+        def record(tree, event):
+            mutations.append((event.kind, event.value))
+        for kind in ('insert', 'delete', 'rebalance'):
+            self._add_hook(kind, record)
+        try:
+            root = self.root
+            built, copying = self._start_clone(None, yield_every)
+            with _gc_paused():  # across the awaits too: a full collection amid the copy stalls the loop just as long
+                for _ in copying:
+                    await asyncio.sleep(0)
+                    if mutations or self.root is not root:  # the part copied so far may be stale
+                        built = None
+                        break
+            if built is not None:
+                built = await asyncio.get_running_loop().run_in_executor(executor, _insert_all, built, values)
+        finally:
+            for kind in ('insert', 'delete', 'rebalance'):
+                self.remove_hook(kind, record)
+        if built is None:
+            await self._insert_in_place(values, yield_every)
+            return
+        for kind, value in mutations:
+            if kind == 'insert':
+                built.insert(value)
+            elif kind == 'delete':
+                built.delete(value)
+        self.__dict__.update(built.__dict__)  # a copy holds neither stats nor hooks, so this tree keeps its own
+
+    async def _insert_in_place(self, values, yield_every):
+        for i, value in enumerate(values, 1):
+            self.insert(value)
+            if i % yield_every == 0:
+                await asyncio.sleep(0)
+
+    def _sorted_snapshot(self):
+        """ Returns the cached sorted snapshot of the tree's values, rebuilding it if the tree changed since the last
+            batch lookup. Numeric trees get a numpy array (when numpy is installed), everything else a list.
+        """
+        if self._snapshot is None:
+            keys = list(self._iter_in_order(self.root))
+            if np is not None:
+                arr = np.array(keys)
+                if arr.ndim == 1 and arr.dtype.kind in 'biuf':
+                    keys = arr
+            self._snapshot = keys
+        return self._snapshot
+
+    def find_many(self, search_vals):
+        """ Batch version of find: returns a boolean mask (a numpy array if numpy is installed, else a list)
+            telling whether each of search_vals is in the tree
+        """
+        snap = self._sorted_snapshot()
+        if np is not None and isinstance(snap, np.ndarray):
+            probes = np.asarray(search_vals)
+            if not len(snap):
+                return np.zeros(probes.shape, dtype=bool)
+            idx = np.searchsorted(snap, probes, side='left')
+            return (idx < len(snap)) & (snap[np.minimum(idx, len(snap) - 1)] == probes)
+        n = len(snap)
+        mask = []
+        for x in search_vals:
+            i = bisect_left(snap, x)
+            mask.append(i < n and snap[i] == x)
+        return np.array(mask, dtype=bool) if np is not None else mask
+
+    def rank_many(self, search_vals):
+        """ Returns, for each of search_vals, the number of values in the tree strictly less than it """
+        snap = self._sorted_snapshot()
+        if np is not None and isinstance(snap, np.ndarray):
+            return np.searchsorted(snap, np.asarray(search_vals), side='left')
+        ranks = [bisect_left(snap, x) for x in search_vals]
+        return np.array(ranks) if np is not None else ranks
+
+    def floor_many(self, search_vals, default=None):
+        """ Returns, for each of search_vals, the greatest value in the tree <= it (default if there is none).
+            With numpy the result is an array of the tree's dtype, or an object array if any default was needed.
+        """
+        snap = self._sorted_snapshot()
+        if np is not None and isinstance(snap, np.ndarray):
+            idx = np.searchsorted(snap, np.asarray(search_vals), side='right') - 1
+            found = idx >= 0
+            if found.all():
+                return snap[idx]
+            out = np.full(idx.shape, default, dtype=object)
+            out[found] = snap[idx[found]]
+            return out
+        floors = []
+        for x in search_vals:
+            i = bisect_right(snap, x) - 1
+            floors.append(snap[i] if i >= 0 else default)
+        return np.array(floors, dtype=object) if np is not None else floors
+
+    def freeze(self):
+        """ Returns an immutable, read-optimized StaticTree snapshot of the values currently in this tree """
+        from StaticTree import StaticTree
+        return StaticTree(self._iter_in_order(self.root), presorted=True)
+
+    def copy(self):
+        """ Returns a copy of this tree with the same shape and per-node bookkeeping (balances, colors, heights,
+            counts...), cloned node by node in one iterative O(n) pass instead of redoing every insert. Values are
+            shared with this tree, not copied. Stats and hooks are not carried over.
+        """
+        return self._clone(None)
+
+    def __copy__(self):
+        return self._clone(None)
+
+    def __deepcopy__(self, memo):
+        return self._clone(memo)
+
+    def __reduce__(self):
+        """ Pickles the tree as a flat pre-order list of node states, so (un)pickling never recurses through the
+            node graph """
+        state, node_attrs = self._plain_state()
+        with _gc_paused():
+            refs, flat = self._flatten(node_attrs)
+        node_cls = type(self.root) if self.root is not None else self._node_type
+        fields = self._node_fields(node_cls)
+        return _unpickle_tree, (type(self), node_cls, state, refs, flat, fields)
+
+    def _node_fields(self, node_cls):
+        """ Returns the names of the attributes a node_cls node of this tree holds besides its links and count,
+            'value' first. Copying and pickling go through these with getattr/setattr: reading a node's __dict__
+            would give it a dict for good on CPython 3.11+, where its attributes otherwise live inline.
+        """
+        return node_cls._fields + self._node_extras
+
+    def _flatten(self, node_attrs):
+        """ Returns ({attribute name: pre-order index} for node_attrs, [(child flags, node state) in pre-order]),
+            a node state being the node's _node_fields values followed by its count
+        """
+        node_cls = type(self.root) if self.root is not None else self._node_type
+        fields = self._node_fields(node_cls)
+        refs = {}
+        flat = []
+        st = [self.root] if self.root is not None else []
+        while st:
+            node = st.pop()
+            for name in node_attrs.get(id(node), ()):
+                refs[name] = len(flat)
+            node_state = tuple([getattr(node, name) for name in fields] + [node.count])
+            flat.append(((node._left is not None) | (node._right is not None) << 1, node_state))
+            if node._right is not None:
+                st.append(node._right)
+            if node._left is not None:
+                st.append(node._left)
+        return refs, flat
+
+    def _plain_state(self):
+        """ Returns (state, node_attrs): a copy of the instance dict without stats wrappers, hooks, the batch
+            snapshot or references to nodes (root, cached nodes like BoundedTree._boundary), and
+            {id(node): [attribute names]} for the node references taken out
+        """
+        state = dict(self.__dict__)
+        if self._stats is not None:
+            for name in self._stats._installed:
+                del state[name]
+        state.pop('_stats', None)
+        state.pop('_hooks', None)
+        state['_snapshot'] = None
+        node_attrs = {}
+        for name, value in list(state.items()):
+            if isinstance(value, TreeNode):
+                node_attrs.setdefault(id(value), []).append(name)
+                state[name] = None
+        return state, node_attrs
+
+    def _clone(self, memo):
+        """ copy() and, with a deepcopy memo, __deepcopy__ (which also deep copies values and tree settings) """
+        clone, copying = self._start_clone(memo)
+        with _gc_paused():
+            for _ in copying:
+                pass
+        return clone
+
+    def _start_clone(self, memo, every=0):
+        """ Returns (clone, copying): clone has this tree's settings but no nodes yet, copying is a generator that
+            copies them in, pausing after each every nodes when every is set (see insert_many_async)
+        """
+        state, node_attrs = self._plain_state()
+        clone = type(self).__new__(type(self))
+        if memo is not None:
+            memo[id(self)] = clone
+            state = deepcopy(state, memo)
+        clone.__dict__.update(state)
+        return clone, self._clone_nodes(clone, node_attrs, memo, every)
+
+    def _clone_nodes(self, clone, node_attrs, memo, every):
+        """ Copies the nodes into clone field by field (see _node_fields), in the order the constructor sets them """
+        fields = {}  # node class -> its fields after 'value'
+        copied = 0
+        st = [(self.root, None, False)] if self.root is not None else []  # (node, parent clone, is right child)
+        while st:
+            node, parent, right = st.pop()
+            node_cls = type(node)
+            rest = fields.get(node_cls)
+            if rest is None:
+                rest = fields[node_cls] = self._node_fields(node_cls)[1:]
+            new = node_cls.__new__(node_cls)
+            new.value = node.value if memo is None else deepcopy(node.value, memo)
+            new._left = new._right = None
+            new._parent = parent
+            for name in rest:
+                setattr(new, name, getattr(node, name) if memo is None else deepcopy(getattr(node, name), memo))
+            if node.count != 1:
+                new.count = node.count
+            if parent is not None:
+                if right:
+                    parent._right = new
+                else:
+                    parent._left = new
+            for name in node_attrs.get(id(node), ()):
+                setattr(clone, name, new)
+            if node._right is not None:
+                st.append((node._right, new, True))
+            if node._left is not None:
+                st.append((node._left, new, False))
+            if every:
+                copied += 1
+                if copied % every == 0:
+                    yield
+
+    def memory_usage(self, deep=False, target=None):
+        """ Returns a dict estimating the bytes this tree takes, walking the nodes iteratively:
+                nodes           number of nodes (tombstones included, multiset duplicates share one)
+                node_bytes      node objects and their __dict__s
+                key_bytes       the values stored, each distinct object counted once (only with deep=True)
+                tree_bytes      the tree object and its __dict__
+                total_bytes     the sum of the above
+                bytes_per_node  (node_bytes + key_bytes) / nodes
+                projected_bytes estimate for a tree of the same kind holding target values (only if target is given),
+                                scaled by this tree's nodes per value
+            Sizes cover the objects themselves, not allocator overhead. Measuring never touches a node's __dict__:
+            on CPython 3.11+ a node keeps its attributes inline until something reads __dict__, which would give it
+            a real dict for good. Such nodes are counted at the size tracemalloc measures for a throwaway node of
+            the same class, and nodes that do have a dict (copied or unpickled ones, say) at the sizes of the node
+            and its dict.
+        """
+        nodes = node_bytes = key_bytes = 0
+        seen = set()
+        inline_bytes = {}  # node class -> measured size of one of its nodes with inline attributes
+        for node in self._iter_nodes(self.root):
+            nodes += 1
+            node_dict = _existing_dict(node)
+            if node_dict is not None:
+                node_bytes += sys.getsizeof(node) + sys.getsizeof(node_dict)
             else:
-                level_str = "{}".format(node.value)
-                print('\t' * level + level_str)
-                self._print_level(node._left, level+1, height)
-                self._print_level(node._right, level+1, height)
+                node_type = type(node)
+                if node_type not in inline_bytes:
+                    inline_bytes[node_type] = _measure_node(node_type)
+                node_bytes += inline_bytes[node_type]
+            if deep and id(node.value) not in seen:
+                seen.add(id(node.value))
+                key_bytes += sys.getsizeof(node.value)
+        tree_dict = _existing_dict(self)
+        tree_bytes = sys.getsizeof(self) + (sys.getsizeof(tree_dict) if tree_dict is not None else 0)
+        usage = {
+            'nodes': nodes,
+            'node_bytes': node_bytes,
+            'tree_bytes': tree_bytes,
+            'total_bytes': node_bytes + key_bytes + tree_bytes,
+            'bytes_per_node': (node_bytes + key_bytes) / nodes if nodes else None,
+        }
+        if deep:
+            usage['key_bytes'] = key_bytes
+        if target is not None:
+            usage['projected_bytes'] = (tree_bytes + round(target * nodes / self._size * usage['bytes_per_node'])
+                                        if self._size else None)
+        return usage
+
+    def enable_stats(self):
+        """ Starts counting comparisons, rotations, rebalances and descent path lengths for this tree.
+            The counting versions of the methods are swapped in on this instance only, so trees that never enable
+            stats (or disable them again) pay nothing for it.
+        """
+        if self._stats is None:
+            from stats import TreeStats
+            self._stats = TreeStats(self)
+            self._stats.install()
+
+    def disable_stats(self):
+        """ Stops counting and restores the uninstrumented methods """
+        if self._stats is not None:
+            self._stats.uninstall()
+            self._stats = None
+
+    def stats(self):
+        """ Returns the counters collected since stats were enabled (or last reset), or None if they are disabled """
+        return self._stats.as_dict() if self._stats is not None else None
+
+    def reset_stats(self):
+        """ Zeroes the counters without disabling them """
+        if self._stats is not None:
+            self._stats.reset()
+
+    def on_insert(self, callback):
+        """ Registers callback(tree, event) to be called after every insert. Returns callback, so it can be used as
+            a decorator. The event's nodes are the newly created node.
+        """
+        return self._add_hook('insert', callback)
+
+    def on_delete(self, callback):
+        """ Registers callback(tree, event) to be called after every delete that found its value. The event's nodes
+            are the node the value was found in (which may now hold its predecessor's value).
+        """
+        return self._add_hook('delete', callback)
+
+    def on_rotate(self, callback):
+        """ Registers callback(tree, event) to be called after every rotation, with nodes (og_root, new_root) """
+        return self._add_hook('rotate', callback)
+
+    def on_rebalance(self, callback):
+        """ Registers callback(tree, event) to be called after every rebalancing step (an AVL rebalance, an
+            RBTree double red fix, or a BSTree rebalance() or scapegoat rebuild), with the node the step started
+            from first in nodes
+        """
+        return self._add_hook('rebalance', callback)
+
+    def remove_hook(self, kind, callback):
+        """ Unregisters a callback previously registered for kind """
+        self._hooks[kind].remove(callback)
+        if not any(self._hooks.values()):
+            self._hooks = None
+
+    def _add_hook(self, kind, callback):
+        if self._hooks is None:
+            self._hooks = {k: [] for k in HOOK_KINDS}
+        self._hooks[kind].append(callback)
+        return callback
+
+    def _emit(self, kind, value, nodes, elapsed):
+        """ Calls the hooks registered for kind. Callers check self._hooks first so unhooked trees skip the timing """
+        event = TreeEvent(kind, value, nodes, elapsed)
+        for callback in self._hooks[kind]:
+            callback(self, event)
+
+    def print_tree(self, max_depth=None, max_nodes=None):
+        """ Prints the tree sideways (one node per line, indented by depth) to stdout, see render """
+        self.render(sys.stdout, max_depth=max_depth, max_nodes=max_nodes)
+
+    def render(self, stream=None, max_depth=None, max_width=None, max_nodes=None, indent='\t'):
+        """ Writes the tree to the text stream (default stdout) one node per line, indented by depth, in pre order.
+            Lines are written as they are produced, so the work done is bounded by the output, not the tree size:
+            max_depth      subtrees below this many levels are elided and replaced by a single '...' line
+            max_nodes      after this many nodes, everything not yet written is elided
+            max_width      lines longer than this many characters are cut short
+            A missing child is shown as None when its sibling exists, so left and right can be told apart.
+        """
+        if stream is None:
+            stream = sys.stdout
+        written = 0
+        st = [(self.root, 0)] if self.root is not None else []
+        while st:
+            node, level = st.pop()
+            if max_nodes is not None and written >= max_nodes:
+                self._write_line(stream, indent * level + '... (truncated)', max_width)
+                return
+            if node is None:
+                self._write_line(stream, indent * level + 'None', max_width)
+                continue
+            self._write_line(stream, indent * level + self._node_label(node), max_width)
+            written += 1
+            if node.left is None and node.right is None:
+                continue
+            if max_depth is not None and level + 1 >= max_depth:
+                self._write_line(stream, indent * (level + 1) + '...', max_width)
+                continue
+            st.append((node.right, level + 1))
+            st.append((node.left, level + 1))
+
+    @staticmethod
+    def _write_line(stream, line, max_width):
+        if max_width is not None and len(line) > max_width:
+            line = line[:max(max_width - 3, 0)] + '...'
+        stream.write(line + '\n')
+
+    def _node_label(self, node):
+        """ The text shown for node by render and print_tree """
+        return "{}".format(node.value)
+
+    def _bounded_height(self, cap):
+        """ Height of the tree, but never looks further down than cap levels (so it costs at most 2^cap nodes) """
+        level = [self.root] if self.root is not None else []
+        height = 0
+        while level and height < cap:
+            height += 1
+            level = [child for n in level for child in (n.left, n.right) if child is not None]
+        return height
 
     def __repr__(self):
         '''From James Collins'''
         em_dash = '\u2014'
-        max_depth = min(5, self.height())
+        max_depth = self._bounded_height(5)
         value_width = 3  # Must be odd.
         node_width = value_width + 2  # Add space for parentheses
         print_width = (node_width + 1) * 2 ** (max_depth - 1) - 1
@@ -253,3 +1082,135 @@ class Tree:
 
         return out[:-1]
 
+
+
+def _existing_dict(obj):
+    """ Returns obj's __dict__ if it exists as a real dict, else None, without creating one. The gc referents of an
+        object with inline attributes (CPython 3.11+) are its attribute values and its type, and become the dict
+        and the type once the dict exists.
+    """
+    if sys.version_info < (3, 11):
+        return obj.__dict__  # every instance has one
+    refs = gc.get_referents(obj)
+    if len(refs) == 2 and type(refs[0]) is dict:
+        return refs[0]
+    return None
+
+
+def _measure_node(node_type, samples=100):
+    """ Bytes tracemalloc traces per freshly made node_type node (object, GC header and inline attribute values) """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        probes = [node_type(None) for _ in range(samples)]
+        size = tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(probes)
+    finally:
+        if started:
+            tracemalloc.stop()
+    return round(size / samples)
+
+
+def _count_sorted(chunks):
+    """ Returns (number of values, number of distinct values) if the chunked values are in ascending order, else
+        (None, None) as soon as one is out of order """
+    n = distinct = 0
+    prev = missing = object()
+    for chunk in chunks:
+        for v in chunk:
+            if prev is missing or prev < v:
+                distinct += 1
+            elif v < prev:
+                return None, None
+            prev = v
+        n += len(chunk)
+    return n, distinct
+
+
+def _runs(chunks):
+    """ Yields (value, number of repeats) for each run of equal values in the chunks """
+    for v, group in groupby(chain.from_iterable(chunks)):
+        yield v, sum(1 for _ in group)
+
+
+def _read_text(path, chunk_size):
+    """ Yields lists of the numbers in a whitespace separated text file, reading chunk_size bytes at a time """
+    with open(path, 'rb') as f:
+        tail = b''  # a number cut in two by the chunk boundary
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            tokens = (tail + block).split()
+            tail = b'' if block[-1:].isspace() or not tokens else tokens.pop()
+            yield [_parse_number(token) for token in tokens]
+        if tail:
+            yield [_parse_number(tail)]
+
+
+def _parse_number(token):
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def _binary_reader(typecode):
+    def read(path, chunk_size):
+        """ Yields arrays of chunk_size values (the last may be shorter) read straight from a binary file """
+        itemsize = array(typecode).itemsize
+        if os.path.getsize(path) % itemsize:
+            raise ValueError("{} is not a whole number of {} byte values".format(path, itemsize))
+        with open(path, 'rb') as f:
+            while True:
+                chunk = array(typecode)
+                try:
+                    chunk.fromfile(f, chunk_size)
+                except EOFError:  # short last chunk, whatever was there has been read
+                    pass
+                if not chunk:
+                    break
+                yield chunk
+    return read
+
+
+_FILE_FORMATS = {
+    'text': _read_text,
+    'int64': _binary_reader('q'),
+    'float64': _binary_reader('d'),
+}
+
+
+def diff(old, new):
+    """ Yields ('removed', value) for each value in old but not in new and ('added', value) for each value in new but
+        not in old, in sorted order, counting duplicates (a value stored twice in old and once in new is removed
+        once). old and new may be trees, StaticTrees or sorted iterables; both are streamed once, in lockstep.
+    """
+    missing = object()
+    old, new = _iter_keys(old), _iter_keys(new)
+    a, b = next(old, missing), next(new, missing)
+    while a is not missing or b is not missing:
+        if b is missing or (a is not missing and a < b):
+            yield ('removed', a)
+            a = next(old, missing)
+        elif a is missing or b < a:
+            yield ('added', b)
+            b = next(new, missing)
+        else:
+            a, b = next(old, missing), next(new, missing)
+
+
+def merge(*trees):
+    """ Lazily yields the values of all of trees in sorted order (a k-way merge of their in order iterators, in
+        O(log k) per value). trees may be trees, StaticTrees, BTrees or sorted iterables; equal values come out in
+        the order of the trees holding them.
+    """
+    return heapq.merge(*(_iter_keys(tree) for tree in trees))
+
+
+def _iter_keys(tree):
+    """ In order iterator over a Tree's values, or over any other iterable as is """
+    if isinstance(tree, Tree):
+        return tree._iter_in_order(tree.root)
+    return iter(tree)
@@ -0,0 +1,87 @@
+"""Measures event loop latency while a large tree is traversed or built through the async APIs.
+
+A ticker task sleeps for 1ms in a loop and records how late each wakeup is; the script reports the p50/p99/max lag
+seen during a blocking to_list() call and during aiter_in_order / insert_many_async at several yield_every settings,
+including a small batch inserted into a tree 5x the size (at least 500k keys) through a thread pool. The large batch
+into that tree still shows pauses of a few hundred ms: the cyclic collector walking the hundreds of thousands of
+nodes the copy allocates, whichever thread it runs on.
+
+Usage: python benchmarks/bench_async.py [n]   (defaults to 10^5 keys)
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AVLTree import AVLTree
+
+
+async def _ticker(lags, stop, interval=0.001):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _measure(label, job):
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.ensure_future(_ticker(lags, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await job()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    lags.sort()
+    pct = lambda p: lags[min(len(lags) - 1, int(p * len(lags)))] * 1e3 if lags else float('nan')
+    print("{:<40} total={:7.3f}s  lag p50={:7.2f}ms  p99={:7.2f}ms  max={:7.2f}ms".format(
+        label, elapsed, pct(0.5), pct(0.99), lags[-1] * 1e3 if lags else float('nan')))
+
+
+async def main(n):
+    values = random.Random(0).sample(range(4 * n), n)
+    tree = AVLTree(values)
+
+    async def blocking_traversal():
+        tree.to_list('in_order')
+    await _measure('to_list (blocking)', blocking_traversal)
+
+    for every in (100, 1000, 10000):
+        async def traversal():
+            async for _ in tree.aiter_in_order(yield_every=every):
+                pass
+        await _measure('aiter_in_order yield_every={}'.format(every), traversal)
+
+    async def blocking_build():
+        AVLTree(values)
+    await _measure('AVLTree(values) (blocking)', blocking_build)
+
+    for every in (100, 1000):
+        async def build():
+            await AVLTree().insert_many_async(values, yield_every=every)
+        await _measure('insert_many_async yield_every={}'.format(every), build)
+
+    with ThreadPoolExecutor(1) as pool:
+        async def offloaded():
+            await AVLTree().insert_many_async(values, executor=pool)
+        await _measure('insert_many_async thread pool', offloaded)
+
+        big = AVLTree(random.Random(1).sample(range(10 * max(n, 10 ** 5)), 5 * max(n, 10 ** 5)))
+
+        async def small_batch():
+            await big.insert_many_async([-v for v in range(1, 11)], executor=pool)
+        await _measure('insert_many_async 10 into {} (pool)'.format(len(big)), small_batch)
+
+        async def large_batch():
+            await big.insert_many_async(values[:len(big) // 4], executor=pool)
+        await _measure('insert_many_async {} into {} (pool)'.format(len(big) // 4, len(big)), large_batch)
+
+
+if __name__ == "__main__":
+    n = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 5
+    asyncio.get_event_loop().run_until_complete(main(n))
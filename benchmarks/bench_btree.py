@@ -0,0 +1,102 @@
+"""Compares lookups in a BTree against AVLTree and RBTree: time per find, nodes visited per find (each one a round
+of Python attribute hops) and key comparisons per find.
+
+Comparisons are counted by looking up keys of an int subclass whose comparison methods count their calls; the BTree's
+bisect calls count as well, they just run from C. Timings use plain ints.
+
+Usage: python benchmarks/bench_btree.py [n ...]   (defaults to 10^5 and 10^6 keys)
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AVLTree import AVLTree
+from BTree import BTree
+from RBTree import RBTree
+
+_comparisons = 0
+
+
+class CountedInt(int):
+    """ An int that counts every comparison made against it """
+    def _counted(name):
+        method = getattr(int, name)
+
+        def compare(self, other):
+            global _comparisons
+            _comparisons += 1
+            return method(self, other)
+        return compare
+
+    __lt__ = _counted('__lt__')
+    __le__ = _counted('__le__')
+    __gt__ = _counted('__gt__')
+    __ge__ = _counted('__ge__')
+    __eq__ = _counted('__eq__')
+    __ne__ = _counted('__ne__')
+    __hash__ = int.__hash__
+    del _counted
+
+
+def btree_nodes_visited(tree, search_val):
+    """ Number of nodes BTree.find looks at for search_val """
+    from bisect import bisect_left
+    node = tree.root
+    visited = 1
+    while True:
+        i = bisect_left(node.keys, search_val)
+        if (i < len(node.keys) and node.keys[i] == search_val) or not node.children:
+            return visited
+        node = node.children[i]
+        visited += 1
+
+
+def bench(n, probes=100000, seed=0):
+    global _comparisons
+    rng = random.Random(seed)
+    keys = rng.sample(range(4 * n), n)
+    queries = [rng.randrange(4 * n) for _ in range(probes)]
+    counted_queries = [CountedInt(q) for q in queries[:10000]]
+
+    trees = []
+    for name, build in (('AVLTree', AVLTree), ('RBTree', RBTree), ('BTree(order=16)', lambda v: BTree(v, order=16)),
+                        ('BTree(order=64)', lambda v: BTree(v, order=64)),
+                        ('BTree(order=256)', lambda v: BTree(v, order=256))):
+        start = time.perf_counter()
+        tree = build(keys)
+        trees.append((name, tree, time.perf_counter() - start))
+
+    hits = None
+    print("n={}".format(n))
+    for name, tree, build_time in trees:
+        start = time.perf_counter()
+        found = sum(1 for q in queries if tree.find(q))
+        per_find = (time.perf_counter() - start) / probes
+        assert hits is None or found == hits
+        hits = found
+
+        _comparisons = 0
+        for q in counted_queries:
+            tree.find(q)
+        comparisons = _comparisons / len(counted_queries)
+
+        if isinstance(tree, BTree):
+            visited = sum(btree_nodes_visited(tree, q) for q in counted_queries) / len(counted_queries)
+        else:
+            tree.enable_stats()
+            for q in counted_queries:
+                tree.find(q)
+            stats = tree.stats()
+            visited = stats['comparisons']['find'] / stats['operations']['find']
+            tree.disable_stats()
+        print("  {:<18} build={:7.2f}s  height={:3}  find={:6.2f}us  nodes/find={:6.2f}  comparisons/find={:6.2f}"
+              .format(name, build_time, tree.height(), per_find * 1e6, visited, comparisons))
+
+
+if __name__ == "__main__":
+    sizes = [int(float(arg)) for arg in sys.argv[1:]] or [10 ** 5, 10 ** 6]
+    for n in sizes:
+        bench(n)
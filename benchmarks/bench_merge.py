@@ -0,0 +1,74 @@
+"""Measures the merge-based paths against building trees value by value.
+
+sort: AVLTree.sort on sorted, nearly sorted, k-run and random input, against inserting every value into an AVLTree
+(the only path sort had before).
+from_merged: k trees of n / k random values each are combined into one AVLTree with Tree.from_merged, against
+inserting the values of merge(*trees) one by one.
+
+Usage: python benchmarks/bench_merge.py [n] [k]   (defaults to 10^5 values and 16 runs / trees)
+"""
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from AVLTree import AVLTree, sort
+from Tree import merge
+from workloads import generate
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def tree_sort(values):
+    return AVLTree(values).to_list('in_order')
+
+
+def k_runs(n, k, rng):
+    values = []
+    for _ in range(k):
+        values.extend(sorted(rng.randrange(4 * n) for _ in range(n // k)))
+    return values
+
+
+def bench_sort(n, k, seed=0):
+    rng = random.Random(seed)
+    inputs = [('sorted', generate('sorted', n, seed)), ('nearly_sorted', generate('nearly_sorted', n, seed)),
+              ('{}_runs'.format(k), k_runs(n, k, rng)), ('random', generate('random', n, seed))]
+    print("sort n={}".format(n))
+    for name, values in inputs:
+        tree_time, expected = timed(tree_sort, values)
+        sort_time, result = timed(sort, values)
+        assert result == expected
+        print("  {:<16} tree={:7.3f}s  sort={:7.3f}s  speedup={:7.2f}x".format(
+            name, tree_time, sort_time, tree_time / sort_time))
+
+
+def from_inserts(trees):
+    tree = AVLTree()
+    for v in merge(*trees):
+        tree.insert(v)
+    return tree
+
+
+def bench_from_merged(n, k, seed=0):
+    rng = random.Random(seed)
+    trees = [AVLTree(rng.sample(range(4 * n), n // k)) for _ in range(k)]
+    insert_time, expected = timed(from_inserts, trees)
+    merged_time, result = timed(AVLTree.from_merged, *trees)
+    assert result.to_list('in_order') == expected.to_list('in_order')
+    print("from_merged n={} k={}: inserts={:.3f}s  from_merged={:.3f}s  speedup={:.2f}x  (heights {} / {})".format(
+        n, k, insert_time, merged_time, insert_time / merged_time, expected.height(), result.height()))
+
+
+if __name__ == "__main__":
+    n = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 5
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    bench_sort(n, k)
+    bench_from_merged(n, k)
@@ -0,0 +1,62 @@
+"""Compares RBTree insertion throughput with top-down insertion (top_down=True, 4-nodes split on the way down in one
+pass) against the default bottom-up path (recursive descent, then color fixes back up from the new leaf).
+
+Each workload is inserted one value at a time into an empty tree; the best of a few repeats is reported along with the
+rotations each path performed.
+
+Usage: python benchmarks/bench_rb_insert.py [n ...]   (defaults to 10^4, 10^5 and 10^6 values)
+"""
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from RBTree import RBTree
+from workloads import generate
+
+WORKLOADS = ['random', 'sorted', 'reverse', 'nearly_sorted', 'duplicate_heavy']
+
+
+def insert_all(values, top_down, repeats=3):
+    """ Best time over repeats to insert values one at a time, and the tree from the last run """
+    best = None
+    for _ in range(repeats):
+        tree = RBTree(top_down=top_down)
+        start = time.perf_counter()
+        for v in values:
+            tree.insert(v)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tree
+
+
+def count_rotations(values, top_down):
+    tree = RBTree(top_down=top_down)
+    tree.enable_stats()
+    for v in values:
+        tree.insert(v)
+    return sum(tree.stats()['rotations'].values())
+
+
+def bench(n):
+    print("n={}".format(n))
+    repeats = 3 if n <= 10 ** 5 else 1
+    for workload in WORKLOADS:
+        values = generate(workload, n)
+        results = []
+        for top_down in (False, True):
+            elapsed, tree = insert_all(values, top_down, repeats)
+            assert len(tree) == n
+            results.append((elapsed, tree.height(), count_rotations(values, top_down)))
+        (bottom_up, bu_height, bu_rotations), (top_down, td_height, td_rotations) = results
+        print("  {:<16} bottom-up={:7.3f}s ({:8.0f}/s, h={:2}, rot={:7})  top-down={:7.3f}s ({:8.0f}/s, h={:2}, rot={:7})"
+              "  speedup={:.2f}x".format(workload, bottom_up, n / bottom_up, bu_height, bu_rotations,
+                                         top_down, n / top_down, td_height, td_rotations, bottom_up / top_down))
+
+
+if __name__ == "__main__":
+    sizes = [int(float(arg)) for arg in sys.argv[1:]] or [10 ** 4, 10 ** 5, 10 ** 6]
+    for n in sizes:
+        bench(n)
@@ -0,0 +1,48 @@
+"""Compares lookups on a frozen StaticTree against Tree.find on the live AVLTree it was frozen from.
+
+Usage: python benchmarks/bench_static.py [n ...]   (defaults to 10^6 and 10^7 keys)
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AVLTree import AVLTree
+
+
+def bench(n, probes=100000, seed=0):
+    rng = random.Random(seed)
+    keys = rng.sample(range(4 * n), n)
+    queries = [rng.randrange(4 * n) for _ in range(probes)]
+
+    start = time.perf_counter()
+    tree = AVLTree(keys)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frozen = tree.freeze()
+    freeze = time.perf_counter() - start
+
+    start = time.perf_counter()
+    live_hits = sum(1 for q in queries if tree.find(q))
+    live = time.perf_counter() - start
+
+    start = time.perf_counter()
+    static_hits = sum(1 for q in queries if frozen.find(q))
+    static = time.perf_counter() - start
+
+    assert live_hits == static_hits
+    print("n={:>9}  build={:8.2f}s  freeze={:6.2f}s  AVLTree.find={:7.3f}us/op  StaticTree.find={:7.3f}us/op  "
+          "speedup={:.2f}x".format(n, build, freeze, live / probes * 1e6, static / probes * 1e6, live / static))
+
+
+def main():
+    sizes = [int(float(a)) for a in sys.argv[1:]] or [10 ** 6, 10 ** 7]
+    for n in sizes:
+        bench(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark harness timing every tree class across the workloads in workloads.py.
+
+For each tree class, workload and size it records the time to build the tree, find a batch of present and absent
+values, delete a batch of values and do a full in order traversal, plus the peak memory of a build. Results are
+written to JSON and, if a baseline file exists, compared against it; any timing that got slower than the baseline by
+more than the threshold is reported and makes the script exit with status 1 so it can gate a release.
+
+Usage:
+    python benchmarks/bench_trees.py                                   # run and compare against baseline.json
+    python benchmarks/bench_trees.py --sizes 1000 10000 --save-baseline
+    python benchmarks/bench_trees.py --trees AVLTree RBTree --workloads random sorted --threshold 0.2
+"""
+import argparse
+import functools
+import gc
+import json
+import os
+import platform
+import random
+import signal
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import AVLTree
+import BSTree
+import RBTree
+import bst_dupes
+from workloads import WORKLOADS, generate
+
+TREES = {
+    'BSTree': BSTree.BSTree,
+    'AVLTree': AVLTree.AVLTree,
+    'RBTree': RBTree.RBTree,
+    'AVLTree-multiset': functools.partial(AVLTree.AVLTree, multiset=True),
+    'RBTree-multiset': functools.partial(RBTree.RBTree, multiset=True),
+    'RBTree-topdown': functools.partial(RBTree.RBTree, top_down=True),
+    'BSTree-scapegoat': functools.partial(BSTree.BSTree, scapegoat=True),
+    'BSTree-lazy': functools.partial(BSTree.BSTree, lazy_delete=True),
+    'AVLTree-lazy': functools.partial(AVLTree.AVLTree, lazy_delete=True),
+    'bst_dupes': bst_dupes.BSTree,
+}
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+TIMED = ('build', 'find', 'delete', 'traversal')
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(HERE, 'results.json')
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise BudgetExceeded()
+
+
+def _timed(fn, *args):
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def _find_all(tree, probes):
+    for p in probes:
+        tree.find(p)
+
+
+def _delete_all(tree, values):
+    for v in values:
+        tree.delete(v)
+
+
+def run_case(tree_cls, values, rng, ops=1000, memory=True):
+    """ Runs every operation once on a tree built from values, returning a dict of metric name -> result """
+    result = {}
+    result['build'], tree = _timed(tree_cls, values)
+    probes = rng.sample(values, min(ops, len(values))) + [-1 - i for i in range(ops)]  # half hits, half misses
+    result['find'], _ = _timed(_find_all, tree, probes)
+    result['traversal'], _ = _timed(tree.to_list, 'in_order')
+    if hasattr(tree, 'delete'):
+        result['delete'], _ = _timed(_delete_all, tree, rng.sample(values, min(ops, len(values))))
+    else:
+        result['delete'] = None  # not supported by this tree class
+    if memory:
+        del tree
+        gc.collect()
+        tracemalloc.start()
+        tree = tree_cls(values)
+        result['memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def run(trees, workloads, sizes, repeat=1, budget=60.0, seed=0, memory=True, log=sys.stderr):
+    """ Runs the whole matrix, returning {"tree/workload/size": metrics}. Timings are the best of repeat runs.
+
+        A case running longer than budget seconds is interrupted (where SIGALRM is available). Once a
+        (tree, workload) pair fails or runs out of budget, larger sizes are skipped for it (eg. an unbalanced BSTree
+        on sorted input) and recorded as such.
+    """
+    use_alarm = budget and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _alarm)
+    results = {}
+    for tree_name in trees:
+        for workload in workloads:
+            skip_reason = None
+            for n in sizes:
+                key = '{}/{}/{}'.format(tree_name, workload, n)
+                if skip_reason:
+                    results[key] = {'skipped': skip_reason}
+                    continue
+                values = generate(workload, n, seed)
+                best = None
+                try:
+                    if use_alarm:
+                        signal.setitimer(signal.ITIMER_REAL, budget * repeat)
+                    for r in range(repeat):
+                        metrics = run_case(TREES[tree_name], values, random.Random(seed + r), memory=memory)
+                        if best is None:
+                            best = metrics
+                        else:
+                            for name in TIMED:
+                                if metrics[name] is not None:
+                                    best[name] = min(best[name], metrics[name])
+                except BudgetExceeded:
+                    results[key] = {'skipped': 'exceeded {}s budget'.format(budget * repeat)}
+                    skip_reason = 'exceeded {}s budget at n={}'.format(budget * repeat, n)
+                    print('{:<40} {}'.format(key, skip_reason), file=log)
+                    continue
+                except Exception as e:
+                    results[key] = {'error': '{}: {}'.format(type(e).__name__, e)}
+                    skip_reason = 'failed at n={}'.format(n)
+                    print('{:<40} error: {}'.format(key, results[key]['error']), file=log)
+                    continue
+                finally:
+                    if use_alarm:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+                results[key] = best
+                print('{:<40} '.format(key) + '  '.join(
+                    '{}={:.4f}s'.format(name, best[name]) for name in TIMED if best[name] is not None), file=log)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Returns a list of (key, metric, baseline, current, ratio) for every timing more than threshold slower """
+    regressions = []
+    for key, metrics in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for name in TIMED:
+            old = base.get(name)
+            new = metrics.get(name)
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append((key, name, old, new, new / old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trees', nargs='+', default=list(TREES), choices=list(TREES))
+    parser.add_argument('--workloads', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument('--sizes', nargs='+', type=lambda s: int(float(s)), default=SIZES)
+    parser.add_argument('--repeat', type=int, default=1, help='keep the best of this many runs per case')
+    parser.add_argument('--budget', type=float, default=60.0, help='seconds a case may run before it and larger sizes are skipped')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the (slow) tracemalloc build')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown vs the baseline (0.1 = 10%%)')
+    args = parser.parse_args(argv)
+
+    results = run(args.trees, args.workloads, args.sizes, args.repeat, args.budget, args.seed, not args.no_memory)
+    report = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        return 0
+    if not os.path.exists(args.baseline):
+        print('No baseline at {}; run with --save-baseline to create one'.format(args.baseline), file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for key, name, old, new, ratio in regressions:
+        print('REGRESSION {:<40} {:<10} {:.4f}s -> {:.4f}s ({:.0%} slower)'.format(key, name, old, new, ratio - 1))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
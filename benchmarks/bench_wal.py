@@ -0,0 +1,85 @@
+"""Measures what a MutationLog costs on the write path and what it saves on recovery.
+
+Throughput: n random inserts into an AVLTree with no log, then with a log syncing every 1, 100 and 10000 records.
+Recovery: a tree of n keys is snapshotted, then m more mutations are logged; recovering (load snapshot + replay) is
+timed against rebuilding the same tree from its values.
+
+Usage: python benchmarks/bench_wal.py [n] [m]   (defaults to 10^5 keys and a 10^4 mutation tail)
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AVLTree import AVLTree
+from wal import MutationLog
+
+
+def throughput(n, seed=0):
+    values = random.Random(seed).sample(range(4 * n), n)
+    start = time.perf_counter()
+    tree = AVLTree()
+    for v in values:
+        tree.insert(v)
+    base = time.perf_counter() - start
+    print("{:<32} {:8.3f}s  {:9.0f} inserts/s".format('no log', base, n / base))
+    for sync_every in (1, 100, 10000):
+        if sync_every == 1 and n > 10 ** 4:  # one fsync per insert, keep it short
+            count = 10 ** 4
+        else:
+            count = n
+        directory = tempfile.mkdtemp()
+        try:
+            tree = AVLTree()
+            log = MutationLog(tree, directory, sync_every=sync_every, sync_interval=None)
+            start = time.perf_counter()
+            for v in values[:count]:
+                tree.insert(v)
+            log.close()
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory)
+        print("{:<32} {:8.3f}s  {:9.0f} inserts/s  overhead={:.2f}x".format(
+            'log sync_every={}{}'.format(sync_every, ' ({} ops)'.format(count) if count != n else ''),
+            elapsed, count / elapsed, (elapsed / count) / (base / n)))
+
+
+def recovery(n, m, seed=0):
+    rng = random.Random(seed)
+    values = rng.sample(range(4 * n), n)
+    directory = tempfile.mkdtemp()
+    try:
+        tree = AVLTree(values)
+        log = MutationLog(tree, directory)
+        for _ in range(m):
+            if rng.random() < 0.5:
+                tree.insert(rng.randrange(4 * n))
+            else:
+                tree.delete(rng.choice(values))
+        log.close()
+        expected = tree.to_list('in_order')
+
+        start = time.perf_counter()
+        recovered = MutationLog.recover(directory)
+        recover = time.perf_counter() - start
+        recovered.close()
+        assert recovered.tree.to_list('in_order') == expected
+
+        start = time.perf_counter()
+        AVLTree(expected)
+        rebuild = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory)
+    print("n={} tail={}: recover={:.3f}s  rebuild={:.3f}s  speedup={:.2f}x".format(
+        n, m, recover, rebuild, rebuild / recover))
+
+
+if __name__ == "__main__":
+    n = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 5
+    m = int(float(sys.argv[2])) if len(sys.argv) > 2 else 10 ** 4
+    throughput(n)
+    recovery(n, m)
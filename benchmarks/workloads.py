@@ -0,0 +1,60 @@
+"""Input generators for the tree benchmarks.
+
+Every generator takes the number of values n and a random.Random instance and returns a list of n ints.
+"""
+import itertools
+import random
+from bisect import bisect_left
+
+
+def random_values(n, rng):
+    """ Distinct values in random order """
+    return rng.sample(range(4 * n), n)
+
+
+def sorted_values(n, rng):
+    """ Distinct values in ascending order (the worst case for an unbalanced tree) """
+    return list(range(0, 4 * n, 4))
+
+
+def reverse_values(n, rng):
+    """ Distinct values in descending order """
+    return list(range(4 * (n - 1), -1, -4))
+
+
+def nearly_sorted_values(n, rng, swap_fraction=0.01):
+    """ Ascending values with a small fraction of random pairs swapped """
+    values = sorted_values(n, rng)
+    for _ in range(int(n * swap_fraction)):
+        i = rng.randrange(n)
+        j = rng.randrange(n)
+        values[i], values[j] = values[j], values[i]
+    return values
+
+
+def zipfian_values(n, rng, s=1.1):
+    """ Values drawn from a Zipf distribution over n ranks, so a few values repeat very often """
+    cum_weights = list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+    total = cum_weights[-1]
+    return [bisect_left(cum_weights, rng.random() * total) for _ in range(n)]
+
+
+def duplicate_heavy_values(n, rng, distinct_fraction=0.01):
+    """ Values drawn uniformly from a small pool, so every value is repeated about 1 / distinct_fraction times """
+    pool = max(1, int(n * distinct_fraction))
+    return [rng.randrange(pool) for _ in range(n)]
+
+
+WORKLOADS = {
+    'random': random_values,
+    'sorted': sorted_values,
+    'reverse': reverse_values,
+    'nearly_sorted': nearly_sorted_values,
+    'zipfian': zipfian_values,
+    'duplicate_heavy': duplicate_heavy_values,
+}
+
+
+def generate(name, n, seed=0):
+    """ Returns the values of workload name at size n, reproducible for a given seed """
+    return WORKLOADS[name](n, random.Random(seed))
@@ -0,0 +1,246 @@
+"""Opt-in structural counters for trees (see Tree.enable_stats)."""
+from collections import Counter
+from functools import partial
+
+from BSTree import BSTree
+from RBTree import BLACK, RED, RBTree
+from Tree import Tree
+
+OPERATIONS = ('find', 'insert', 'delete')
+ROTATIONS = {'rotate_left': 'left', 'rotate_right': 'right', '_rotate_left': 'left', '_rotate_right': 'right'}
+
+
+class TreeStats:
+    """ Counters for one tree.
+
+        Counting is done by wrapper functions stored on the tree instance, shadowing the class's methods while
+        stats are enabled; uninstall() deletes them again, so a tree without stats runs exactly the same code it
+        always did rather than checking a flag on every call. The iterative descents (see DESCENTS) are shadowed
+        by counting copies of their loops, recursive ones by a wrapper counting one node per call.
+
+    Attributes
+    ----------
+    operations : Counter
+        Number of calls to each public operation (find, insert, delete).
+    comparisons : Counter
+        Key comparisons made by each operation, counted as one per node visited on the way down.
+    path_lengths : dict of Counter
+        For each operation, a histogram of descent path length (nodes visited) -> number of operations.
+    rotations : Counter
+        Number of left and right rotations (AVLTree.rotate_*, RBTree._rotate_* and BSTree._rotate_*).
+    rebalances : Counter
+        AVL rebalance triggers, split into single and double rotations, and whole-tree BSTree rebalances ('full').
+    rb_fixes : Counter
+        RBTree._fix_rb_prop calls by case: 'none' (parent black), 'recolor' (red uncle), 'rotate' and 'double_rotate'.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._installed = []
+        self._path = 0
+        self.reset()
+
+    def reset(self):
+        """ Zeroes every counter """
+        self.operations = Counter()
+        self.comparisons = Counter()
+        self.path_lengths = {op: Counter() for op in OPERATIONS}
+        self.rotations = Counter()
+        self.rebalances = Counter()
+        self.rb_fixes = Counter()
+
+    def as_dict(self):
+        """ Returns a snapshot of the counters as plain dicts """
+        return {
+            'operations': dict(self.operations),
+            'comparisons': dict(self.comparisons),
+            'comparisons_per_op': {op: self.comparisons[op] / count for op, count in self.operations.items()},
+            'path_lengths': {op: dict(sorted(hist.items())) for op, hist in self.path_lengths.items() if hist},
+            'rotations': dict(self.rotations),
+            'rebalances': dict(self.rebalances),
+            'rb_fixes': dict(self.rb_fixes),
+        }
+
+    def install(self):
+        """ Shadows the tree's methods with counting wrappers """
+        tree = self.tree
+        for op in OPERATIONS:
+            if hasattr(tree, op):
+                self._wrap(op, self._counting_op(op, getattr(tree, op)))
+        for name in ('_find', '_find_live', '_insert', '_insert_top_down'):
+            if hasattr(tree, name):
+                counting = DESCENTS.get(getattr(type(tree), name))
+                if counting is not None:
+                    self._wrap(name, partial(counting, tree, self))
+                else:
+                    self._wrap(name, self._counting_descent(getattr(tree, name)))
+        for name, direction in ROTATIONS.items():
+            if hasattr(tree, name):
+                self._wrap(name, self._counting_rotation(direction, getattr(tree, name)))
+        if hasattr(tree, 'rebalance'):
+            self._wrap('rebalance', self._counting_rebalance(tree.rebalance))
+        if hasattr(tree, '_fix_rb_prop'):
+            self._wrap('_fix_rb_prop', self._counting_rb_fix(tree._fix_rb_prop))
+
+    def uninstall(self):
+        """ Removes the wrappers, restoring the class's own methods """
+        for name in self._installed:
+            del self.tree.__dict__[name]
+        self._installed = []
+
+    def _wrap(self, name, wrapper):
+        self.tree.__dict__[name] = wrapper
+        self._installed.append(name)
+
+    def _counting_op(self, op, method):
+        def wrapper(*args, **kwargs):
+            outer = self._path
+            self._path = 0
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.operations[op] += 1
+                self.comparisons[op] += self._path
+                self.path_lengths[op][self._path] += 1
+                self._path = outer
+        return wrapper
+
+    def _counting_descent(self, method):
+        def wrapper(current, *args, **kwargs):
+            if current is not None:
+                self._path += 1
+            return method(current, *args, **kwargs)
+        return wrapper
+
+    def _counting_rotation(self, direction, method):
+        def wrapper(og_root):
+            self.rotations[direction] += 1
+            return method(og_root)
+        return wrapper
+
+    def _counting_rebalance(self, method):
+        def wrapper(*args):
+            if not args:  # BSTree.rebalance() rebuilds the whole tree
+                self.rebalances['full'] += 1
+                return method()
+            current = args[0]
+            if current.balance < -1:
+                self.rebalances['double' if current.right.balance > 0 else 'single'] += 1
+            elif current.balance > 1:
+                self.rebalances['double' if current.left.balance < 0 else 'single'] += 1
+            return method(current)
+        return wrapper
+
+    def _counting_rb_fix(self, method):
+        def wrapper(current):
+            p_node = current.parent
+            if (not p_node) or (p_node.color == BLACK):
+                self.rb_fixes['none'] += 1
+            else:
+                sib_node = p_node.get_sibling()
+                if sib_node and sib_node.color == RED:
+                    self.rb_fixes['recolor'] += 1
+                elif (p_node is p_node.parent.left) == (current is p_node.left):
+                    self.rb_fixes['rotate'] += 1
+                else:
+                    self.rb_fixes['double_rotate'] += 1
+            return method(current)
+        return wrapper
+
+
+# Counting copies of the iterative descents, taking the tree and its TreeStats first. Each must stay in step with the
+# method it stands in for (the tree classes keep plain loops, so counting costs nothing while stats are off).
+
+def _find(tree, stats, current, search_val):
+    visited = 0
+    while current is not None:
+        visited += 1
+        if search_val == current.value:
+            break
+        current = current.left if search_val < current.value else current.right
+    stats._path += visited
+    return current
+
+
+def _find_live(tree, stats, search_val):
+    visited = 0
+    found = None
+    st = [tree.root]
+    while st:
+        node = st.pop()
+        if node is None:
+            continue
+        visited += 1
+        if search_val < node.value:
+            st.append(node.left)
+        elif node.value < search_val:
+            st.append(node.right)
+        elif node.count:
+            found = node
+            break
+        else:
+            st.append(node.left)
+            st.append(node.right)
+    stats._path += visited
+    return found
+
+
+def _bst_insert(tree, stats, current, new_val):
+    visited = 1
+    while True:
+        if new_val <= current.value:
+            if current.left is None:
+                new_node = current.left = tree._new_node(new_val, parent=current)
+                break
+            current = current.left
+        else:
+            if current.right is None:
+                new_node = current.right = tree._new_node(new_val, parent=current)
+                break
+            current = current.right
+        visited += 1
+    stats._path += visited
+    while current is not None:
+        height = current.height
+        tree._fix_height(current)
+        if current.height == height:
+            break
+        current = current.parent
+    return new_node
+
+
+def _rb_insert_top_down(tree, stats, new_val):
+    node = tree.root
+    visited = 1
+    while True:
+        left = node.left
+        if left is not None and left.color == RED:
+            right = node.right
+            if right is not None and right.color == RED:
+                node.color = RED
+                left.color = right.color = BLACK
+                if node.parent is not None and node.parent.color == RED:
+                    tree._fix_red_parent(node)
+        if new_val <= node.value:
+            if node.left is None:
+                new_node = node.left = tree._new_node(new_val, parent=node)
+                break
+            node = node.left
+        else:
+            if node.right is None:
+                new_node = node.right = tree._new_node(new_val, parent=node)
+                break
+            node = node.right
+        visited += 1
+    stats._path += visited
+    tree._fix_red_parent(new_node)
+    tree.root.color = BLACK
+    return new_node
+
+
+DESCENTS = {  # class method -> its counting copy
+    Tree._find: _find,
+    Tree._find_live: _find_live,
+    BSTree._insert: _bst_insert,
+    RBTree._insert_top_down: _rb_insert_top_down,
+}
@@ -0,0 +1,229 @@
+"""Regression tests for write-ahead log recovery and the balance invariants of the self-balancing trees.
+
+Run from the repository root with python -m pytest tests (or python -m unittest discover tests).
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AVLTree import AVLTree
+from BTree import BTree
+from RBTree import BLACK, RED, RBTree
+from wal import MutationLog, _HEADER
+
+
+def _files(directory):
+    return sorted(name for name in os.listdir(directory) if not name.endswith('.tmp'))
+
+
+class MutationLogTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _log_path(self):
+        logs = [name for name in _files(self.dir) if name.endswith('.wal')]
+        self.assertEqual(len(logs), 1)
+        return os.path.join(self.dir, logs[0])
+
+    def test_recover_cuts_torn_record(self):
+        tree = AVLTree([5, 1])
+        with MutationLog(tree, self.dir, sync_every=1, sync_interval=None):
+            for v in (3, 8, 2):
+                tree.insert(v)
+            tree.delete(1)
+        path = self._log_path()
+        intact = os.path.getsize(path)
+        with open(path, 'ab') as f:  # a crash halfway through writing a 100 byte record
+            f.write(_HEADER.pack(100, 0) + b'\x80' * 10)
+        log = MutationLog.recover(self.dir, sync_interval=None)
+        self.assertEqual(log.tree.to_list('in_order'), [2, 3, 5, 8])
+        self.assertEqual(os.path.getsize(path), intact)
+        log.tree.insert(4)  # appended right after the last intact record
+        log.close()
+        log = MutationLog.recover(self.dir, sync_interval=None)
+        self.assertEqual(log.tree.to_list('in_order'), [2, 3, 4, 5, 8])
+        log.close()
+
+    def test_recover_cuts_record_with_bad_crc(self):
+        tree = RBTree()
+        with MutationLog(tree, self.dir, sync_every=1, sync_interval=None):
+            tree.insert(1)
+            tree.insert(2)
+        path = self._log_path()
+        intact = os.path.getsize(path)
+        payload = b'not a pickle'
+        with open(path, 'ab') as f:
+            f.write(_HEADER.pack(len(payload), zlib.crc32(payload) ^ 1) + payload)
+        log = MutationLog.recover(self.dir, sync_interval=None)
+        self.assertEqual(log.tree.to_list('in_order'), [1, 2])
+        self.assertEqual(os.path.getsize(path), intact)
+        log.close()
+
+    def test_snapshot_removes_older_generations(self):
+        tree = RBTree(range(10))
+        log = MutationLog(tree, self.dir, sync_every=1, sync_interval=None)
+        tree.insert(10)
+        log.snapshot()
+        tree.delete(0)
+        log.snapshot()
+        tree.insert(11)
+        log.close()
+        self.assertEqual(_files(self.dir), ['log-00000003.wal', 'snapshot-00000003.pickle'])
+        log = MutationLog.recover(self.dir, sync_interval=None)
+        self.assertEqual(log.tree.to_list('in_order'), list(range(1, 12)))
+        log.close()
+
+    def test_flusher_syncs_pending_records(self):
+        tree = AVLTree()
+        log = MutationLog(tree, self.dir, sync_every=1000, sync_interval=0.05)
+        tree.insert(1)
+        tree.insert(2)
+        deadline = time.monotonic() + 5
+        while log._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(log._pending, 0)
+        self.assertGreater(os.path.getsize(self._log_path()), 0)  # on disk without an explicit sync or close
+        log.close()
+        self.assertFalse(log._flusher.is_alive())
+
+    def test_flusher_and_mutations_share_the_lock(self):
+        tree = RBTree()
+        log = MutationLog(tree, self.dir, sync_every=1000, sync_interval=0.001)
+        rng = random.Random(7)
+        expected = []
+        for _ in range(3000):
+            v = rng.randrange(500)
+            if expected and rng.random() < 0.3:
+                v = rng.choice(expected)
+                expected.remove(v)
+                tree.delete(v)
+            else:
+                expected.append(v)
+                tree.insert(v)
+        log.close()
+        log = MutationLog.recover(self.dir, sync_interval=None)
+        self.assertEqual(log.tree.to_list('in_order'), sorted(expected))
+        log.close()
+
+
+def _check_rb(test, tree):
+    """ Parent links, no red node with a red child, a black root and the same number of black nodes on every path """
+    test.assertTrue(tree.root is None or tree.root.color == BLACK)
+    st = [(tree.root, None)]
+    heights = {}
+    order = []
+    while st:
+        node, parent = st.pop()
+        if node is None:
+            continue
+        test.assertIs(node.parent, parent)
+        if node.color == RED:
+            for child in (node.left, node.right):
+                test.assertTrue(child is None or child.color == BLACK)
+        order.append(node)
+        st.append((node.left, node))
+        st.append((node.right, node))
+    for node in reversed(order):  # children before parents
+        left = heights.get(id(node.left), 1)
+        right = heights.get(id(node.right), 1)
+        test.assertEqual(left, right)
+        heights[id(node)] = left + (node.color == BLACK)
+
+
+def _check_avl(test, tree):
+    """ Parent links and balance factors matching the subtree heights, all within [-1, 1] """
+    st = [(tree.root, None)]
+    heights = {}
+    order = []
+    while st:
+        node, parent = st.pop()
+        if node is None:
+            continue
+        test.assertIs(node.parent, parent)
+        order.append(node)
+        st.append((node.left, node))
+        st.append((node.right, node))
+    for node in reversed(order):
+        left = heights.get(id(node.left), 0)
+        right = heights.get(id(node.right), 0)
+        test.assertEqual(node.balance, left - right)
+        test.assertLessEqual(abs(node.balance), 1)
+        heights[id(node)] = 1 + max(left, right)
+
+
+def _check_btree(test, tree):
+    """ Every node but the root holds t - 1 to 2t - 1 keys, internal nodes one more child than keys, and every leaf
+        sits at the same depth """
+    t = tree._t
+    leaf_depths = set()
+    st = [(tree.root, 0)]
+    while st:
+        node, depth = st.pop()
+        test.assertLessEqual(len(node.keys), 2 * t - 1)
+        if node is not tree.root:
+            test.assertGreaterEqual(len(node.keys), t - 1)
+        test.assertEqual(node.keys, sorted(node.keys))
+        if node.children:
+            test.assertEqual(len(node.children), len(node.keys) + 1)
+            st.extend((child, depth + 1) for child in node.children)
+        else:
+            leaf_depths.add(depth)
+    test.assertLessEqual(len(leaf_depths), 1)
+
+
+class BalanceInvariantTest(unittest.TestCase):
+    def _run(self, make, check, seed, ops=600, keys=150):
+        """ Random inserts (duplicates included) and deletes (of present and absent values) on make(), checking the
+            invariants and the contents against a sorted list after every operation """
+        rng = random.Random(seed)
+        tree = make()
+        expected = []
+        for _ in range(ops):
+            if expected and rng.random() < 0.45:
+                v = rng.choice(expected) if rng.random() < 0.9 else keys + rng.randrange(10)
+                if v in expected:
+                    expected.remove(v)
+                tree.delete(v)
+            else:
+                v = rng.randrange(keys)
+                expected.append(v)
+                tree.insert(v)
+            check(self, tree)
+            self.assertEqual(len(tree), len(expected))
+        self.assertEqual(list(tree.to_list('in_order')), sorted(expected))
+        while expected:  # delete down to empty
+            v = expected.pop(rng.randrange(len(expected)))
+            tree.delete(v)
+            check(self, tree)
+        self.assertEqual(len(tree), 0)
+
+    def test_rb_tree(self):
+        for seed in range(5):
+            self._run(RBTree, _check_rb, seed)
+
+    def test_rb_tree_top_down(self):
+        for seed in range(5):
+            self._run(lambda: RBTree(top_down=True), _check_rb, seed)
+
+    def test_avl_tree(self):
+        for seed in range(5):
+            self._run(AVLTree, _check_avl, seed)
+
+    def test_btree(self):
+        for order in (4, 5, 8):
+            for seed in range(3):
+                self._run(lambda: BTree(order=order), _check_btree, seed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+"""A write-ahead log of tree mutations, with periodic snapshots, for recovering a tree after a crash."""
+import os
+import pickle
+import re
+import struct
+import threading
+import zlib
+from time import perf_counter
+
+_HEADER = struct.Struct('<II')  # payload length, crc32 of the payload
+_INSERT = 'i'
+_DELETE = 'd'
+_FILE = re.compile(r'^(snapshot|log)-(\d+)\.(pickle|wal)$')
+
+
+class MutationLog:
+    """ Appends every insert and delete made on a tree to a log file in directory, so the tree can be rebuilt by
+        MutationLog.recover after a crash.
+
+        The log starts from a snapshot (a pickle of the whole tree) and only holds the mutations made since, so
+        recovery loads the latest snapshot and replays the tail of the log after it. Call snapshot() from time to
+        time to keep that tail short; older snapshots and logs are removed once a new snapshot is safely on disk.
+
+        Records are collected in memory and written with a single fsync once sync_every of them are pending or
+        sync_interval seconds have passed since the last sync (group commit): a crash loses at most the mutations
+        since the last sync, and sync_every=1 makes every mutation durable before the call returns. A background
+        thread syncs records left pending for sync_interval, so a burst followed by idle time is not held in memory
+        indefinitely. Each record is framed with its length and a CRC, so a record torn by a crash is detected and
+        dropped on recovery.
+    """
+    def __init__(self, tree, directory, sync_every=1000, sync_interval=1.0):
+        """ Starts logging tree's mutations to directory (created if needed), beginning with a snapshot of its
+            current contents. sync_interval may be None to sync on record count only.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._setup(tree, directory, sync_every, sync_interval)
+        self._generation = max((gen for _, gen in _list(directory)), default=0)
+        self.snapshot()
+        self._attach()
+
+    @classmethod
+    def recover(cls, directory, sync_every=1000, sync_interval=1.0):
+        """ Rebuilds the tree from the latest snapshot in directory and the log written after it, and returns a
+            MutationLog that carries on appending to that log (the recovered tree is its .tree). A torn record at
+            the end of the log is cut off.
+        """
+        snapshots = [gen for kind, gen in _list(directory) if kind == 'snapshot']
+        if not snapshots:
+            raise FileNotFoundError("no snapshot in {}".format(directory))
+        log = cls.__new__(cls)
+        log._generation = max(snapshots)
+        with open(os.path.join(directory, _name('snapshot', log._generation)), 'rb') as f:
+            log._setup(pickle.load(f), directory, sync_every, sync_interval)
+        path = log._path('log')
+        end = _replay(log.tree, path) if os.path.exists(path) else 0
+        log._file = open(path, 'ab')
+        log._file.truncate(end)
+        log._attach()
+        return log
+
+    def _setup(self, tree, directory, sync_every, sync_interval):
+        if sync_every < 1:
+            raise ValueError("sync_every must be >= 1")
+        self.tree = tree
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._buffer = bytearray()
+        self._pending = 0
+        self._last_sync = perf_counter()
+        self._file = None
+        self._lock = threading.RLock()  # the flusher thread syncs concurrently with the tree's mutations
+        self._closed = threading.Event()
+        self._flusher = None
+
+    def snapshot(self):
+        """ Writes a snapshot of the tree and starts a new, empty log after it. The snapshot is fsynced and renamed
+            into place before the old snapshot and log are removed, so a crash at any point leaves a recoverable
+            directory.
+        """
+        with self._lock:
+            self.sync()
+            self._generation += 1
+            path = self._path('snapshot')
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(self.tree, f, pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            new_file = open(self._path('log'), 'wb')
+            _fsync_dir(self.directory)
+            if self._file is not None:
+                self._file.close()
+            self._file = new_file
+            for kind, gen in _list(self.directory):
+                if gen < self._generation:
+                    os.remove(os.path.join(self.directory, _name(kind, gen)))
+
+    def sync(self):
+        """ Writes and fsyncs every pending record """
+        with self._lock:
+            if self._buffer:
+                self._file.write(self._buffer)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._buffer = bytearray()
+            self._pending = 0
+            self._last_sync = perf_counter()
+
+    def close(self):
+        """ Syncs pending records and stops logging the tree """
+        if self._file is None:
+            return
+        self.tree.remove_hook('insert', self._on_insert)
+        self.tree.remove_hook('delete', self._on_delete)
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _attach(self):
+        self.tree.on_insert(self._on_insert)
+        self.tree.on_delete(self._on_delete)
+        if self.sync_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='MutationLog flusher', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        """ Background thread: syncs records that have been pending for sync_interval seconds """
+        wait = self.sync_interval
+        while not self._closed.wait(wait):
+            with self._lock:
+                due = self._last_sync + self.sync_interval - perf_counter()
+                if self._pending and due <= 0:
+                    self.sync()
+                    due = self.sync_interval
+            wait = max(due, 0.001) if self._pending else self.sync_interval
+
+    def _on_insert(self, tree, event):
+        self._append(_INSERT, event.value)
+
+    def _on_delete(self, tree, event):
+        self._append(_DELETE, event.value)
+
+    def _append(self, op, value):
+        payload = pickle.dumps((op, value), pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if not self._pending:
+                self._last_sync = perf_counter()  # the interval runs from the first record left unsynced
+            self._buffer += _HEADER.pack(len(payload), zlib.crc32(payload))
+            self._buffer += payload
+            self._pending += 1
+            if self._pending >= self.sync_every or (
+                    self.sync_interval is not None and perf_counter() - self._last_sync >= self.sync_interval):
+                self.sync()
+
+    def _path(self, kind):
+        return os.path.join(self.directory, _name(kind, self._generation))
+
+
+def _replay(tree, path):
+    """ Applies the records of the log at path to tree, returning the offset just past the last intact record """
+    offset = 0
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            length, crc = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            op, value = pickle.loads(payload)
+            if op == _INSERT:
+                tree.insert(value)
+            else:
+                tree.delete(value)
+            offset += _HEADER.size + length
+    return offset
+
+
+def _name(kind, generation):
+    return '{}-{:08d}.{}'.format(kind, generation, 'pickle' if kind == 'snapshot' else 'wal')
+
+
+def _list(directory):
+    """ Returns (kind, generation) for every snapshot and log file in directory """
+    found = []
+    for name in os.listdir(directory):
+        match = _FILE.match(name)
+        if match:
+            found.append((match.group(1), int(match.group(2))))
+    return found
+
+
+def _fsync_dir(directory):
+    """ Makes renames and new files in directory durable (a no-op where directories can't be opened) """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)